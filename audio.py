@@ -0,0 +1,105 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+from engine import EngineEvent, TournamentEngine
+
+# cue name: (file, maxtime in ms, 0 plays the whole file)
+CUES = {"one_minute": ("noises/bell.wav", 0),
+        "countdown": ("noises/beep.wav", 0),
+        "level_up": ("noises/box1.wav", 1500), # crop the sound to a box ring
+        "break_start": ("noises/bell_cartoon.wav", 0),
+        "break_end": ("noises/box2.wav", 0)}
+COUNTDOWN_S = 10
+RESCHEDULE_GRACE_S = 0.05 # cues due this soon survive a reschedule, so 0:00 still rings when the level change is noticed
+
+
+class AudioCues:
+  # Sounds decoded into memory once and played from a worker thread at monotonic times,
+  # level cues are queued against the level deadline instead of waiting for the GUI tick
+  def __init__(self, cues: dict = CUES, mixer_buffer: int = 512):
+    self.cues = cues
+    self.mixer_buffer = mixer_buffer # small buffer, lower output latency
+    self.sounds = {}
+    self.queue = [] # (monotonic time, seq, cue)
+    self.seq = itertools.count()
+    self.cond = threading.Condition()
+    self.latencies_ms = deque(maxlen=1000)
+    self.thread = threading.Thread(target=self.run, daemon=True)
+
+  def load(self):
+    from pygame import mixer
+    mixer.pre_init(buffer=self.mixer_buffer)
+    mixer.init()
+    self.sounds = {name: (mixer.Sound(path), maxtime) for name, (path, maxtime) in self.cues.items()}
+
+  def start(self):
+    self.thread.start()
+
+  # Scheduling
+  def play(self, cue: str, delay_s: float = 0.0):
+    with self.cond:
+      heapq.heappush(self.queue, (time.monotonic() + delay_s, next(self.seq), cue))
+      self.cond.notify()
+
+  def cancel(self):
+    with self.cond:
+      keep_until = time.monotonic() + RESCHEDULE_GRACE_S
+      self.queue = [entry for entry in self.queue if entry[0] <= keep_until]
+      heapq.heapify(self.queue)
+      self.cond.notify()
+
+  def schedule_level(self, remaining_s: float):
+    self.cancel()
+    if remaining_s > 60:
+      self.play("one_minute", remaining_s - 60)
+    for s in range(COUNTDOWN_S, 0, -1):
+      if remaining_s > s:
+        self.play("countdown", remaining_s - s)
+    if remaining_s > RESCHEDULE_GRACE_S:
+      self.play("level_up", remaining_s)
+
+  def attach(self, engine: TournamentEngine):
+    def on_engine_event(event: EngineEvent):
+      if event.kind == "pause":
+        self.cancel()
+        self.play("break_start")
+      elif engine.is_running:
+        if event.kind == "start" and engine.pauses:
+          self.play("break_end")
+        self.schedule_level(engine.clock.remaining())
+        if event.kind == "timeout" and engine.current_entry().is_break:
+          self.play("break_start", RESCHEDULE_GRACE_S) # after the level_up ring
+      else:
+        self.cancel()
+    engine.listeners.append(on_engine_event)
+
+  # Worker
+  def run(self):
+    if not self.sounds:
+      self.load()
+    while True:
+      with self.cond:
+        while True:
+          if not self.queue:
+            self.cond.wait()
+            continue
+          delay = self.queue[0][0] - time.monotonic()
+          if delay <= 0:
+            at, _, cue = heapq.heappop(self.queue)
+            break
+          self.cond.wait(delay)
+      sound, maxtime = self.sounds[cue]
+      sound.play(maxtime=maxtime)
+      self.latencies_ms.append((time.monotonic() - at) * 1000)
+
+  def latency_stats(self) -> dict:
+    if not self.latencies_ms:
+      return {"played": 0}
+    ordered = sorted(self.latencies_ms)
+    return {"played": len(ordered),
+            "mean_ms": round(sum(ordered) / len(ordered), 3),
+            "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+            "max_ms": round(ordered[-1], 3)}
@@ -0,0 +1,322 @@
+from startup import STARTUP # first, so a cold start child measures its own imports
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Offscreen and silent, the same numbers on a CI box as on a dev machine
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+BENCHMARKS = ("cold_start", "tick_to_paint", "resize_burst", "settings_update", "load_configs", "steady_rss")
+COLD_START_GEOMETRIES = ("QVGA", "VGA", "FHD", "UHD")
+COLD_START_RUNS = 3
+CHILD_RESULT = "BENCHMARK_RESULT " # children print other things too, e.g. the pygame banner
+TICK_SECONDS = 10
+RESIZE_BURSTS = 6
+RESIZE_EVENTS = 30 # resize events per burst, about half a second of dragging a window corner
+SETTINGS_LEVELS = (100, 1000, 5000)
+SETTINGS_UPDATES = 10
+LOAD_ROUNDS = 50
+RSS_SECONDS = 30
+
+
+def summary(samples_ms: list[float]) -> dict:
+  if not samples_ms:
+    return {"n": 0}
+  ordered = sorted(samples_ms)
+  def quantile(q: float) -> float:
+    return round(ordered[int(q * (len(ordered) - 1))], 3)
+  return {"n": len(ordered), "mean": round(sum(ordered) / len(ordered), 3),
+          "p50": quantile(0.5), "p95": quantile(0.95), "max": round(ordered[-1], 3)}
+
+
+def rss_mb() -> float:
+  # resident set of this process now, the peak where /proc is missing
+  try:
+    with open("/proc/self/statm") as f:
+      return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+  except (OSError, ValueError):
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 2**10, 1)
+
+
+def run_child(*args: str) -> tuple[dict, float]:
+  # a fresh interpreter, returns its JSON line and the wall time until it was printed
+  start = time.perf_counter()
+  child = subprocess.Popen([sys.executable, __file__, "--child", *args], stdout=subprocess.PIPE, text=True)
+  for line in child.stdout:
+    if line.startswith(CHILD_RESULT):
+      wall_ms = (time.perf_counter() - start) * 1000
+      break
+  else:
+    line = None
+  child.wait()
+  if child.returncode or line is None:
+    raise RuntimeError(f"Benchmark child {args} failed with exit code {child.returncode}")
+  return json.loads(line[len(CHILD_RESULT):]), wall_ms
+
+
+# In-process helpers
+APP = None
+
+def application():
+  global APP # kept referenced, a collected QApplication takes the widgets with it
+  if APP is None:
+    from PyQt5.QtWidgets import QApplication
+    APP = QApplication(sys.argv[:1])
+  return APP
+
+
+def process_events_for(seconds: float):
+  from PyQt5.QtCore import QTimer
+  from PyQt5.QtWidgets import QApplication
+  QTimer.singleShot(int(seconds * 1000), QApplication.instance().quit)
+  QApplication.instance().exec_()
+
+
+def close(ptw):
+  from PyQt5.QtCore import QEvent
+  from PyQt5.QtWidgets import QApplication
+  for timer in (ptw.round_timer, ptw.update_timer, ptw.total_timer, ptw.break_timer):
+    timer.stop()
+  ptw.main_window.close()
+  ptw.main_window.deleteLater()
+  QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+
+def probed_timer_class():
+  from poker_timer import PokerTimer
+
+  class ProbedPokerTimer(PokerTimer):
+    # stamps every round_timer timeout and the first repaint of the round timer text after it
+    def __init__(self, *args, **kwargs):
+      self.timeout_at = None
+      self.latencies_ms = []
+      super().__init__(*args, **kwargs)
+      if self.renderer == "painted":
+        target, region = self.mv_display, lambda: self.mv_display.cells.get("round_timer")
+      else:
+        target, region = self.mv_display.labels["round_timer"], lambda: None
+      paint = target.paintEvent
+      def probed_paint(event):
+        paint(event)
+        cell = region()
+        if self.timeout_at is not None and (cell is None or event.rect().intersects(cell)):
+          self.latencies_ms.append((time.perf_counter() - self.timeout_at) * 1000)
+          self.timeout_at = None
+      target.paintEvent = probed_paint
+
+    def update_stats_every_sec(self):
+      if self.timeout_at is None:
+        self.timeout_at = time.perf_counter()
+      super().update_stats_every_sec()
+
+  return ProbedPokerTimer
+
+
+# Benchmarks
+def bench_cold_start(geometries=COLD_START_GEOMETRIES, runs: int = COLD_START_RUNS) -> dict:
+  # process start to the first painted main window, in a new interpreter per run
+  results = {}
+  for geometry in geometries:
+    walls, phases = [], {}
+    for _ in range(runs):
+      child, wall_ms = run_child("cold_start", geometry)
+      walls.append(wall_ms)
+      for name, took_ms in child["phases"].items():
+        phases.setdefault(name, []).append(took_ms)
+    results[geometry] = {"process_ms": summary(walls),
+                         "phases_ms": {name: summary(samples) for name, samples in phases.items()}}
+  return results
+
+
+def child_cold_start(geometry: str) -> dict:
+  app = application()
+  from poker_timer import PokerTimer
+  from utils import WindowGeometry
+  STARTUP.mark("imports")
+  ptw = PokerTimer(geometry=getattr(WindowGeometry, geometry).value)
+  app.processEvents()
+  STARTUP.mark("first paint")
+  phases = {name: round((end - start) * 1000, 3) for name, start, end in STARTUP.phases}
+  close(ptw)
+  return {"phases": phases}
+
+
+def bench_tick_to_paint(seconds: float = TICK_SECONDS) -> dict:
+  # round_timer timeout to the repaint that shows the new second, on the real event loop
+  application()
+  from utils import WindowGeometry
+  results = {}
+  for renderer in ("labels", "painted"):
+    ptw = probed_timer_class()(geometry=WindowGeometry.FHD.value, renderer=renderer)
+    ptw.start_stop_round_timer()
+    process_events_for(seconds)
+    results[renderer] = {"latency_ms": summary(ptw.latencies_ms),
+                         "wakeup_drift_ms": ptw.current_state.clock.drift_stats()}
+    close(ptw)
+  return results
+
+
+def bench_resize_burst(bursts: int = RESIZE_BURSTS, events: int = RESIZE_EVENTS) -> dict:
+  # a window corner dragged between VGA and UHD: resize events until the coalesced relayout is applied
+  app = application()
+  from poker_timer import PokerTimer
+  from utils import WindowGeometry
+  ptw = PokerTimer(geometry=WindowGeometry.VGA.value)
+  app.processEvents()
+  small, large = WindowGeometry.VGA.value, WindowGeometry.UHD.value
+  burst_ms, event_ms = [], []
+  for burst in range(bursts):
+    start = time.perf_counter()
+    for step in range(events):
+      share = (step + 1) / events if burst % 2 == 0 else 1 - (step + 1) / events
+      t0 = time.perf_counter()
+      ptw.main_window.resize(int(small.width() + share * (large.width() - small.width())),
+                             int(small.height() + share * (large.height() - small.height())))
+      app.processEvents()
+      event_ms.append((time.perf_counter() - t0) * 1000)
+    while ptw.resize_coalescer.timer.isActive():
+      app.processEvents()
+    burst_ms.append((time.perf_counter() - start) * 1000)
+  result = {"burst_ms": summary(burst_ms), "event_ms": summary(event_ms), "coalescer": ptw.resize_coalescer.stats()}
+  close(ptw)
+  return result
+
+
+def large_config(levels: int, step: int = 1):
+  from config import MyTime, PokerConfig
+  return PokerConfig(NAME=f"BENCH{levels}", STARTING_CHIP_AMOUNT=10000, CHIP_INCREMENT=5,
+                     BIG_BLIND_VALUES=[10 * step * (level + 1) for level in range(levels)],
+                     LEVEL_PERIOD=MyTime(20, 0))
+
+
+def bench_settings_update(sizes=SETTINGS_LEVELS, updates: int = SETTINGS_UPDATES) -> dict:
+  # SettingsWindow.update after the structure was replaced in place, every row changes
+  app = application()
+  from settings_window import SettingsWindow
+  results = {}
+  for levels in sizes:
+    config = large_config(levels)
+    window = SettingsWindow(config)
+    window.show()
+    app.processEvents()
+    variants = (large_config(levels, step=2), large_config(levels))
+    samples = []
+    for update in range(updates):
+      for name, val in variants[update % 2].__dict__.items():
+        setattr(config, name, val)
+      t0 = time.perf_counter()
+      window.update()
+      app.processEvents()
+      samples.append((time.perf_counter() - t0) * 1000)
+    results[str(levels)] = summary(samples)
+    window.close()
+  return results
+
+
+def bench_load_configs(directory: Path = Path("configs"), rounds: int = LOAD_ROUNDS) -> dict:
+  from config import load_config_from_json
+  paths = sorted(directory.glob("*.json"))
+  samples = []
+  for _ in range(rounds):
+    t0 = time.perf_counter()
+    for path in paths:
+      load_config_from_json(path)
+    samples.append((time.perf_counter() - t0) * 1000)
+  return {"files": len(paths), "directory_ms": summary(samples)}
+
+
+def bench_steady_rss(seconds: float = RSS_SECONDS) -> dict:
+  child, _ = run_child("steady_rss", str(seconds))
+  return child
+
+
+def child_steady_rss(seconds: float) -> dict:
+  # RSS once a second of a running clock with the settings window prewarmed, growth means a leak
+  application()
+  from PyQt5.QtCore import QTimer
+  from poker_timer import PokerTimer
+  from utils import WindowGeometry
+  ptw = PokerTimer(geometry=WindowGeometry.FHD.value)
+  ptw.start_stop_round_timer()
+  samples = [rss_mb()]
+  sampler = QTimer()
+  sampler.timeout.connect(lambda: samples.append(rss_mb()))
+  sampler.start(1000)
+  process_events_for(seconds)
+  close(ptw)
+  return {"seconds": seconds, "start_mb": samples[0], "end_mb": samples[-1], "max_mb": max(samples),
+          "growth_mb": round(samples[-1] - samples[min(5, len(samples) - 1)], 1)} # after the prewarm settled
+
+
+def run(names) -> dict:
+  git = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+  from PyQt5.QtCore import QT_VERSION_STR
+  report = {"commit": git.stdout.strip() if git.returncode == 0 else None,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "qt": QT_VERSION_STR,
+            "platform": f"{platform.system()} {platform.machine()}", "qpa": os.environ["QT_QPA_PLATFORM"],
+            "results": {}}
+  for name in names:
+    t0 = time.perf_counter()
+    report["results"][name] = globals()[f"bench_{name}"]()
+    print(f"{name}: {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+  return report
+
+
+def flatten(tree: dict, prefix: str = "") -> dict:
+  out = {}
+  for key, val in tree.items():
+    if isinstance(val, dict):
+      out.update(flatten(val, f"{prefix}{key}."))
+    elif isinstance(val, (int, float)) and not isinstance(val, bool):
+      out[f"{prefix}{key}"] = val
+  return out
+
+
+def compare(old: dict, new: dict) -> str:
+  old_values, new_values = flatten(old["results"]), flatten(new["results"])
+  lines = [f"{'metric':<60}{old.get('commit') or 'old':>12}{new.get('commit') or 'new':>12}{'change':>9}"]
+  for key, val in new_values.items():
+    if key in old_values:
+      was = old_values[key]
+      change = f"{(val - was) / was * 100:+.0f}%" if was else ""
+      lines.append(f"{key:<60}{was:>12}{val:>12}{change:>9}")
+  return "\n".join(lines)
+
+
+if __name__ == "__main__":
+  import argparse as argp
+  parser = argp.ArgumentParser(description="Benchmark the timer under the Qt offscreen platform, results as JSON")
+  parser.add_argument("-b", "--benchmarks", nargs="+", default=BENCHMARKS, choices=BENCHMARKS)
+  parser.add_argument("-o", "--output", default=None, type=Path, help="Write the JSON here instead of stdout")
+  parser.add_argument("--compare", nargs=2, default=None, type=Path, metavar=("OLD", "NEW"),
+                      help="Print the change of every number between two result files")
+  parser.add_argument("--child", nargs="+", default=None, help=argp.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.child is not None:
+    name, *params = args.child
+    if name == "cold_start":
+      result = child_cold_start(*params)
+    else:
+      result = child_steady_rss(float(*params))
+    print(CHILD_RESULT + json.dumps(result), flush=True)
+    os._exit(0) # skip Qt and pygame teardown, the parent only waits for the line above
+  elif args.compare is not None:
+    old, new = (json.loads(path.read_text()) for path in args.compare)
+    print(compare(old, new))
+  else:
+    report = json.dumps(run(args.benchmarks), indent=2)
+    if args.output is None:
+      print(report)
+    else:
+      args.output.parent.mkdir(parents=True, exist_ok=True)
+      args.output.write_text(report + "\n")
@@ -0,0 +1,102 @@
+import math
+import time
+from typing import Callable
+
+
+class DeadlineClock:
+  # Counts down to a monotonic deadline instead of accumulating ticks,
+  # so late or coalesced timer events never shift the level end.
+  EARLY_TOLERANCE_S = 0.001
+  __slots__ = ("time_fn", "deadline", "remaining_at_stop", "scheduled_wakeup",
+               "wakeups", "last_drift_ms", "max_drift_ms", "total_drift_ms")
+
+  def __init__(self, time_fn: Callable[[], float] = time.monotonic):
+    self.time_fn = time_fn
+    self.deadline = None # set only while running
+    self.remaining_at_stop = 0.0
+    self.scheduled_wakeup = None
+    self.wakeups = 0
+    self.last_drift_ms = 0.0
+    self.max_drift_ms = 0.0
+    self.total_drift_ms = 0.0
+
+  @property
+  def is_running(self) -> bool:
+    return self.deadline is not None
+
+  def reset(self, duration_s: float):
+    if self.is_running:
+      self.deadline = self.time_fn() + duration_s
+    else:
+      self.remaining_at_stop = duration_s
+
+  def extend(self, duration_s: float):
+    # Level rollover: move the deadline by exactly one period so that
+    # lateness of the wakeup that noticed it does not accumulate
+    if self.is_running:
+      self.deadline += duration_s
+    else:
+      self.remaining_at_stop += duration_s
+
+  def start(self):
+    if not self.is_running:
+      self.deadline = self.time_fn() + self.remaining_at_stop
+
+  def stop(self):
+    if self.is_running:
+      self.remaining_at_stop = max(0.0, self.deadline - self.time_fn()) # stopped late, e.g. after the last level
+      self.deadline = None
+      self.scheduled_wakeup = None
+
+  def remaining(self) -> float:
+    if self.is_running:
+      return self.deadline - self.time_fn()
+    return self.remaining_at_stop
+
+  def remaining_seconds(self) -> int:
+    # whole seconds shown on the display, 20:00 for the first second of a 20 min level;
+    # a timer firing up to EARLY_TOLERANCE_S early still counts as the new second
+    return max(0, math.ceil(self.remaining() - self.EARLY_TOLERANCE_S))
+
+  def subsecond_ms(self) -> int:
+    # ms elapsed since the displayed second started
+    elapsed = self.remaining_seconds() - self.remaining()
+    return min(999, max(0, int(elapsed * 1000)))
+
+  def next_wakeup_ms(self) -> int:
+    # time until the displayed second changes, remembered to measure drift
+    now = self.time_fn()
+    shown = self.remaining_seconds()
+    until_boundary = self.remaining() - (shown - 1) if shown > 0 else 1.0
+    self.scheduled_wakeup = now + until_boundary
+    return max(0, math.ceil(until_boundary * 1000))
+
+  def mark_wakeup(self) -> float | None:
+    # drift of this wakeup in ms, None if no wakeup was scheduled
+    if self.scheduled_wakeup is None:
+      return None
+    drift_ms = (self.time_fn() - self.scheduled_wakeup) * 1000
+    self.scheduled_wakeup = None
+    self.wakeups += 1
+    self.last_drift_ms = drift_ms
+    self.max_drift_ms = max(self.max_drift_ms, abs(drift_ms))
+    self.total_drift_ms += abs(drift_ms)
+    return drift_ms
+
+  def drift_stats(self) -> dict:
+    return {"wakeups": self.wakeups,
+            "last_ms": round(self.last_drift_ms, 3),
+            "max_ms": round(self.max_drift_ms, 3),
+            "mean_ms": round(self.total_drift_ms / self.wakeups, 3) if self.wakeups else 0.0}
+
+
+class VirtualClock:
+  # Manually advanced time source, pass it as DeadlineClock(time_fn=...) to run faster than real time
+  def __init__(self, start: float = 0.0):
+    self.now = start
+
+  def __call__(self) -> float:
+    return self.now
+
+  def advance(self, seconds: float):
+    self.now += seconds
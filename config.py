@@ -0,0 +1,112 @@
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from schedule import LevelSchedule, ScheduleError, compile_schedule
+
+
+class MyTime:
+  def __init__(self, m:int, s:int):
+    self.m = m
+    self.s = s
+
+  @classmethod
+  def fromstr(cls, string:str):
+    if ":" in string:
+      x = string.split(":")
+      m, s = int(x[0]), int(x[-1])
+    else:
+      m = int(string)
+      s = 0
+    return cls(m,s)
+
+  def __repr__(self):
+    return f"MyTime({self.m}, {self.s})"
+
+  def _list(self):
+    return list((self.m, self.s))
+
+  def _arr(self):
+    from numpy import asarray # only needed here, keeps the engine importable without numpy
+    return asarray([self.m, self.s])
+
+  def seconds(self) -> int:
+    return self.m * 60 + self.s
+
+
+@dataclass
+class PokerConfig:
+  NAME: str = "NULL"
+  STARTING_CHIP_AMOUNT: int = -1
+  CHIP_INCREMENT : int = -1 # Smallest difference between chips
+  BIG_BLIND_VALUES : any = -1 # BB Values for every level of the game
+  LEVEL_PERIOD : MyTime = MyTime(-1,-1)
+  NEW : bool = False
+  ANTE_VALUES : list | None = None # optional, one ante per level
+  LEVEL_PERIODS : list | None = None # optional, one [m, s] per level instead of LEVEL_PERIOD
+  BREAKS : list | None = None # optional, [after_level, [m, s]] entries
+  REBUY_CHIPS : int | None = None # optional, chips of a rebuy, STARTING_CHIP_AMOUNT if unset
+  ADDON_CHIPS : int | None = None # optional, chips of an add-on, STARTING_CHIP_AMOUNT if unset
+  schedule : LevelSchedule | None = field(default=None, repr=False, compare=False)
+
+  def compiled(self) -> LevelSchedule:
+    # compiled (and validated) at load, configs built in code are compiled on first use
+    if self.schedule is None:
+      self.schedule = compile_schedule(self)
+    return self.schedule
+
+
+# json keys of a config file and their types, the rest of PokerConfig is optional
+REQUIRED_KEYS = {"NAME": str, "STARTING_CHIP_AMOUNT": int, "CHIP_INCREMENT": int,
+                 "BIG_BLIND_VALUES": list, "LEVEL_PERIOD": list}
+OPTIONAL_KEYS = {"ANTE_VALUES": list, "LEVEL_PERIODS": list, "BREAKS": list,
+                 "REBUY_CHIPS": int, "ADDON_CHIPS": int, "NEW": bool}
+
+
+def schema_errors(cdict) -> list[str]:
+  # missing, unknown and mistyped keys, checked before PokerConfig(**cdict) turns them into a TypeError
+  if not isinstance(cdict, dict):
+    return [f"Expected a json object, got {type(cdict).__name__}"]
+  errors = [f"Missing key {name}" for name in REQUIRED_KEYS if name not in cdict]
+  errors += [f"Unknown key {name}" for name in cdict if name not in REQUIRED_KEYS and name not in OPTIONAL_KEYS]
+  for name, val in cdict.items():
+    kind = REQUIRED_KEYS.get(name) or OPTIONAL_KEYS.get(name)
+    if kind is None or (val is None and name in OPTIONAL_KEYS):
+      continue
+    if not isinstance(val, kind) or (kind is int and isinstance(val, bool)):
+      errors.append(f"{name} must be {kind.__name__}, got {val!r}")
+  period = cdict.get("LEVEL_PERIOD")
+  if isinstance(period, list) and (len(period) != 2 or any(not isinstance(val, int) or isinstance(val, bool) for val in period)):
+    errors.append(f"LEVEL_PERIOD must be [minutes, seconds] integers, got {period!r}")
+  return errors
+
+
+def load_config_from_json(path: Path) -> PokerConfig | bool:
+  def dict_to_config(_dict: dict):
+    errors = schema_errors(_dict)
+    if errors:
+      name = _dict.get("NAME") if isinstance(_dict, dict) else None
+      raise ScheduleError(name if isinstance(name, str) else path.name, errors)
+    _dict["LEVEL_PERIOD"] = MyTime(*_dict["LEVEL_PERIOD"])
+    config = PokerConfig(**_dict)
+    config.compiled() # raises ScheduleError with every problem of the file
+    return config
+  if not path.exists() or path.is_dir():
+    return False
+  with open(path, "r") as f:
+    config = json.load(f)
+  if isinstance(config, dict):
+    config["NEW"] = True
+  return dict_to_config(config)
+
+
+def dump_config_to_json(config: PokerConfig):
+  cdict = {name: val for name, val in config.__dict__.items() if name not in ("NEW", "schedule") and val is not None}
+  cdict["LEVEL_PERIOD"] = cdict["LEVEL_PERIOD"]._list()
+  return cdict
+
+
+def format_config_json(cdict: dict) -> str:
+  # one key per line with inline lists, how the files in configs/ are laid out (give or take whitespace)
+  lines = [f"  {json.dumps(name)}: {json.dumps(val)}" for name, val in cdict.items()]
+  return "{\n" + ",\n".join(lines) + "\n}\n"
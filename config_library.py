@@ -0,0 +1,129 @@
+import copy
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+from config import PokerConfig, load_config_from_json
+from schedule import ScheduleError
+
+
+class LibraryEntry(NamedTuple):
+  mtime_ns: int
+  size: int
+  config: PokerConfig | None
+  error: str | None
+
+
+class ConfigLibrary:
+  # Index of every structure under a directory, keyed by path and (mtime, size).
+  # A rescan only stats the files and re-parses the ones that changed.
+  def __init__(self, directory: Path = Path("configs"), pattern: str = "*.json"):
+    self.directory = Path(directory)
+    self.pattern = pattern
+    self.entries: dict[Path, LibraryEntry] = {}
+    self.by_name: dict[str, Path] = {}
+    self.parses = 0
+
+  def scan(self) -> list[Path]:
+    # returns the paths that were (re)parsed or removed
+    changed = []
+    seen = set()
+    for path in sorted(self.directory.rglob(self.pattern)):
+      path = path.resolve()
+      seen.add(path)
+      if self.refresh(path):
+        changed.append(path)
+    for path in set(self.entries) - seen:
+      del self.entries[path]
+      changed.append(path)
+    if changed:
+      self.by_name = {entry.config.NAME.upper(): path
+                      for path, entry in self.entries.items() if entry.config is not None}
+    return changed
+
+  def refresh(self, path: Path) -> bool:
+    path = Path(path).resolve()
+    try:
+      stat = os.stat(path)
+    except FileNotFoundError:
+      entry = self.entries.pop(path, None)
+      self.unindex(path, entry)
+      return entry is not None
+    entry = self.entries.get(path)
+    if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+      return False
+    self.unindex(path, entry)
+    self.parses += 1
+    try:
+      # keys, types and the compiled schedule are checked by load_config_from_json
+      config = load_config_from_json(path) or None # False for a directory matching the pattern
+      error = None if config is not None else "Not a config file"
+    except ScheduleError as e:
+      config, error = None, "; ".join(e.errors)
+    except (OSError, ValueError, TypeError, KeyError) as e: # json.JSONDecodeError is a ValueError
+      config, error = None, repr(e)
+    self.entries[path] = LibraryEntry(stat.st_mtime_ns, stat.st_size, config, error)
+    if self.entries[path].config is not None:
+      self.by_name[self.entries[path].config.NAME.upper()] = path
+    return True
+
+  def unindex(self, path: Path, entry: LibraryEntry | None):
+    # the NAME of a changed or deleted file stops resolving to it, another file with the same NAME takes over
+    if entry is None or entry.config is None:
+      return
+    name = entry.config.NAME.upper()
+    if self.by_name.get(name) != path:
+      return
+    del self.by_name[name]
+    for other, other_entry in self.entries.items():
+      if other != path and other_entry.config is not None and other_entry.config.NAME.upper() == name:
+        self.by_name[name] = other
+        break
+
+  # Lookup, configs are handed out as copies since the GUI updates its config in place
+  def get(self, path: Path) -> PokerConfig | None:
+    path = Path(path).resolve()
+    self.refresh(path)
+    entry = self.entries.get(path)
+    if entry is None or entry.config is None:
+      return None
+    return copy.deepcopy(entry.config)
+
+  def find(self, name: str) -> PokerConfig | None:
+    path = self.path_of(name)
+    return None if path is None else self.get(path)
+
+  def path_of(self, name: str) -> Path | None:
+    return self.by_name.get(name.upper())
+
+  def names(self) -> list[str]:
+    return sorted(entry.config.NAME for entry in self.entries.values() if entry.config is not None)
+
+  def errors(self) -> dict[Path, str]:
+    return {path: entry.error for path, entry in self.entries.items() if entry.error is not None}
+
+
+if __name__ == "__main__":
+  import argparse as argp
+  import time
+  parser = argp.ArgumentParser(description="Index a directory of PokerConfig .json files")
+  parser.add_argument("directory", nargs="?", default=Path("configs"), type=Path)
+  parser.add_argument("-f", "--find", default=None, help="Print the config with this NAME")
+  args = parser.parse_args()
+
+  t0 = time.perf_counter()
+  library = ConfigLibrary(args.directory)
+  library.scan()
+  print(f"Indexed {len(library.entries)} files in {(time.perf_counter() - t0) * 1000:.1f} ms")
+  if args.find is not None:
+    path = library.path_of(args.find)
+    if path is None:
+      raise SystemExit(f"No config named {args.find}")
+    with open(path, "r") as f:
+      print(f"{path}:\n{json.dumps(json.load(f), indent=2)}")
+  else:
+    for name in library.names():
+      print(f"{name:<20}{library.path_of(name)}")
+    for path, error in library.errors().items():
+      print(f"INVALID {path}: {error}")
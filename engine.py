@@ -0,0 +1,231 @@
+import time
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from clock import DeadlineClock, VirtualClock
+from config import PokerConfig, load_config_from_json
+from schedule import Level
+
+
+class EngineEvent(NamedTuple):
+  kind: str # start, pause, timeout, next, prev, jump, reset, config, finished
+  level: int
+  previous_level: int
+  at: float # clock time_fn() when the event happened
+
+LEVEL_CHANGE_KINDS = ("timeout", "next", "prev", "jump", "reset")
+# every kind an engine or a display following one emits, stored by index (history, shared clock): append only
+EVENT_KINDS = ("start", "pause", "timeout", "next", "prev", "jump", "reset", "config", "finished", "sync")
+
+
+class TournamentEngine:
+  # Levels, breaks, pauses and resets of one tournament, free of Qt and pygame.
+  # Time comes only from the clock, the GUI timers just decide when to look at it.
+  def __init__(self,
+               config: PokerConfig,
+               clock: DeadlineClock | None = None
+               ):
+    self.position = 0 # index into the compiled schedule, breaks included
+    self.clock = DeadlineClock() if clock is None else clock
+    self.listeners: list[Callable[[EngineEvent], None]] = []
+    self.started = False
+    self.pause_started = None
+    self.pauses = 0
+    self.loading = False # set while the reset of a structure load is emitted, "config" follows it
+    self.created_at = self.clock.time_fn()
+    self.update_config(config)
+
+  def now(self) -> float:
+    return self.clock.time_fn()
+
+  def emit(self, kind: str, previous_level: int | None = None):
+    event = EngineEvent(kind, self.current_level,
+                        self.current_level if previous_level is None else previous_level,
+                        self.now())
+    for listener in self.listeners:
+      listener(event)
+
+  def update_config(self, config: PokerConfig, update_counters: bool = True):
+    previous = getattr(self, "schedule", None)
+    self.config = config
+    self.schedule = config.compiled()
+
+    if update_counters:
+      self.reset_timer()
+    elif previous is not None and previous is not self.schedule:
+      # hot reload or table edit: the same level keeps playing, wherever added or removed breaks put it
+      entry = previous[min(self.position, len(previous)-1)]
+      self.position = self.schedule.position_of_entry(entry)
+      current, remaining = self.current_entry(), self.clock.remaining()
+      if (current.level, current.is_break) == (entry.level, entry.is_break):
+        remaining += current.duration_s - entry.duration_s # an edited period keeps the time played in it
+      self.clock.extend(max(0.0, min(remaining, current.duration_s)) - self.clock.remaining())
+
+  @property
+  def current_level(self) -> int:
+    return self.schedule[self.position].level
+
+  def current_entry(self) -> Level:
+    return self.schedule[self.position]
+
+  def last_level(self) -> int:
+    return self.schedule[-1].level
+
+  def level_period_s(self) -> int:
+    return self.schedule[self.position].duration_s
+
+  def schedule_elapsed(self) -> float:
+    # tournament clock time, pauses excluded
+    return self.schedule.end_of(self.position) - self.clock.remaining()
+
+  # Pause/Resume
+  @property
+  def is_running(self) -> bool:
+    return self.clock.is_running
+
+  @property
+  def is_finished(self) -> bool:
+    # the last level ran out, only a level change starts the clock again
+    return self.position >= len(self.schedule)-1 and self.clock.remaining_seconds() == 0
+
+  def start(self):
+    if self.is_running or self.is_finished:
+      return
+    self.clock.start()
+    self.started = True
+    self.pause_started = None
+    self.emit("start")
+
+  def pause(self):
+    if not self.is_running:
+      return
+    self.clock.stop()
+    self.pause_started = self.now()
+    self.pauses += 1
+    self.emit("pause")
+
+  def toggle(self):
+    if self.is_running:
+      self.pause()
+    else:
+      self.start()
+
+  def break_elapsed(self) -> float:
+    if self.pause_started is None:
+      return 0.0
+    return self.now() - self.pause_started
+
+  def total_elapsed(self) -> float:
+    return self.now() - self.created_at
+
+  # State
+  def get_state(self):
+    if self.config.NEW:
+      self.config.NEW = False
+      self.schedule = self.config.compiled()
+      self.loading = True
+      try:
+        self.reset_level()
+      finally:
+        self.loading = False
+      self.emit("config")
+
+    return [self.current_level,
+            self.minute, self.second,
+            *self.get_blinds(self.position)]
+
+  def get_blinds(self, position: int):
+    entry = self.schedule[position]
+    nxt = self.schedule.next_level(position)
+    if nxt is None:
+      return entry.big_blind, entry.small_blind, "N/A", "N/A"
+    return entry.big_blind, entry.small_blind, nxt.big_blind, nxt.small_blind
+
+  def update_from_clock(self):
+    if self.clock.remaining_seconds() == 0 and self.is_running:
+      if self.position >= len(self.schedule)-1:
+        # no further levels, the tournament ends on the last level's 0:00
+        self.clock.stop()
+        self.emit("finished")
+      else:
+        previous = self.current_level
+        # normally the next entry, after a long stall (suspend) the one the elapsed time falls into
+        position, _ = self.schedule.locate(self.schedule_elapsed() + DeadlineClock.EARLY_TOLERANCE_S)
+        position = max(position, self.position + 1)
+        # move the deadline by exactly the skipped durations, so wakeup lateness does not accumulate
+        self.clock.extend(self.schedule.end_of(position) - self.schedule.end_of(self.position))
+        self.position = position
+        self.emit("timeout", previous)
+    self.minute, self.second = divmod(self.clock.remaining_seconds(), 60)
+
+  def seek(self, elapsed_s: float):
+    # put the tournament clock at elapsed_s (pauses excluded) without emitting level events
+    self.position, remaining = self.schedule.locate(elapsed_s)
+    self.clock.reset(remaining)
+    self.minute, self.second = divmod(self.clock.remaining_seconds(), 60)
+
+  # Level changes
+  def nxt_level(self):
+    previous = self.current_level
+    if self.position != len(self.schedule)-1:
+      self.position += 1
+    self.reset_timer()
+    self.emit("next", previous)
+
+  def prev_level(self):
+    previous = self.current_level
+    if self.position != 0:
+      self.position -= 1
+    self.reset_timer()
+    self.emit("prev", previous)
+
+  def jump_level(self, level: int):
+    previous = self.current_level
+    self.position = self.schedule.position_of_level(level)
+    self.reset_timer()
+    self.emit("jump", previous)
+
+  def reset_level(self):
+    previous = self.current_level
+    self.position = 0
+    self.reset_timer()
+    self.emit("reset", previous)
+
+  def reset_timer(self):
+    self.clock.reset(self.level_period_s())
+    self.minute, self.second = divmod(self.level_period_s(), 60)
+
+
+def replay(config: PokerConfig, tick_s: float | None = None) -> list[EngineEvent]:
+  # Plays the whole structure on a VirtualClock. Without tick_s it jumps straight
+  # from deadline to deadline, with it the clock is polled like the GUI does.
+  virtual = VirtualClock()
+  engine = TournamentEngine(config, DeadlineClock(virtual))
+  events = []
+  engine.listeners.append(events.append)
+  engine.start()
+  while engine.is_running:
+    virtual.advance(engine.clock.remaining() if tick_s is None else tick_s)
+    engine.update_from_clock()
+  return events
+
+
+if __name__ == "__main__":
+  import argparse as argp
+  parser = argp.ArgumentParser(description="Replay a tournament structure on a virtual clock")
+  parser.add_argument("config", type=Path, help="Path to a .json file with PokerConfig")
+  parser.add_argument("-t", "--tick", default=None, type=float, help="Poll the clock every TICK virtual seconds instead of jumping to deadlines")
+  parser.add_argument("-r", "--repeat", default=1, type=int, help="Replay the structure REPEAT times and report the mean wall time")
+  args = parser.parse_args()
+
+  cfg = load_config_from_json(args.config)
+  if not cfg:
+    raise ValueError(f"Config file {args.config.absolute()} does not exist!")
+  t0 = time.perf_counter()
+  for _ in range(args.repeat):
+    events = replay(cfg, args.tick)
+  wall_ms = (time.perf_counter() - t0) * 1000 / args.repeat
+  for event in events:
+    if event.kind in LEVEL_CHANGE_KINDS or event.kind == "finished":
+      print(f"{int(event.at // 3600)}:{int(event.at % 3600 // 60):02d}:{int(event.at % 60):02d} {event.kind:8s} level {event.level:02d}")
+  print(f"{cfg.NAME}: {len(events)} events replayed in {wall_ms:.3f} ms")
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import queue
+import select
+import socket
+import struct
+import threading
+import time
+
+from config import MyTime, PokerConfig, dump_config_to_json, schema_errors
+from config_library import ConfigLibrary
+from engine import EngineEvent, TournamentEngine
+from schedule import ScheduleError
+
+# One authority multicasts the clock state, any number of displays on the LAN follow it
+GROUP = "239.255.42.99"
+GROUP_PORT = 50042
+CONTROL_PORT = 50043 # unicast: clock sync pings, state and config requests
+KEYFRAME_S = 2.0 # full state, for late joiners, lost deltas and config edits that emit no event
+SYNC_PINGS = 8
+SYNC_INTERVAL_S = 60.0 # monotonic clocks of two machines drift apart by a few ms per minute
+SYNC_TIMEOUT_S = 0.2
+MAX_DATAGRAM = 65000
+REMOTE_EVENTS = ("next", "prev", "jump", "reset", "pause", "start")
+STATE_FIELDS = ("position", "deadline", "remaining", "started", "paused_at", "created", "config")
+NUMBER = (int, float)
+STATE_TYPES = {"position": (int,), "deadline": NUMBER + (type(None),), "remaining": NUMBER + (type(None),),
+               "started": (bool,), "paused_at": NUMBER + (type(None),), "created": NUMBER, "config": (str,)}
+# op of a reply: the fields it must have, None is a multicast state message
+MESSAGE_FIELDS = {None: {"seq": (int,), "kind": (str,), "state": (dict,)},
+                  "pong": {"t": NUMBER, "now": NUMBER},
+                  "state": {"seq": (int,), "state": (dict,)},
+                  "config": {"hash": (str,), "config": (dict,)},
+                  "error": {"error": (str,)}}
+
+
+def config_hash(config: PokerConfig) -> str:
+  return hashlib.sha1(json.dumps(dump_config_to_json(config), sort_keys=True).encode()).hexdigest()[:16]
+
+
+def valid_message(message) -> bool:
+  # anything on the LAN can send to the group and reply to the control socket, the GUI thread only sees these
+  if not isinstance(message, dict) or message.get("op") not in MESSAGE_FIELDS:
+    return False
+  fields = MESSAGE_FIELDS[message.get("op")]
+  if any(not isinstance(message.get(name), kinds) for name, kinds in fields.items()):
+    return False
+  state = message.get("state", {}) if "state" in fields else {}
+  return (all(name in STATE_TYPES and isinstance(val, STATE_TYPES[name]) for name, val in state.items())
+          and state.get("position", 0) >= 0)
+
+
+def apply_published_state(engine: TournamentEngine, state: dict, config: PokerConfig, offset: float = 0.0) -> bool:
+  # puts a display's engine where the authority's is, STATE_FIELDS times shifted by offset.
+  # Returns whether the level, the running flag or the deadline changed
+  before = (engine.position, engine.is_running, engine.clock.deadline, engine.clock.remaining_at_stop)
+  if config is not engine.config:
+    for name, val in config.__dict__.items():
+      setattr(engine.config, name, val)
+    engine.config.NEW = False
+    engine.update_config(engine.config, update_counters=False)
+  engine.position = min(state["position"], len(engine.schedule)-1)
+  if state["deadline"] is not None:
+    engine.clock.deadline = state["deadline"] - offset
+  else:
+    engine.clock.deadline = None
+    engine.clock.remaining_at_stop = state["remaining"]
+  engine.started = state["started"]
+  engine.pause_started = None if state["paused_at"] is None else state["paused_at"] - offset
+  engine.created_at = state["created"] - offset
+  engine.update_from_clock()
+  return before != (engine.position, engine.is_running, engine.clock.deadline, engine.clock.remaining_at_stop)
+
+
+class FanoutServer:
+  # Sends a delta of the engine state on every engine event and a keyframe every KEYFRAME_S.
+  # Times are the authority's time.monotonic(), displays convert them with their clock offset.
+  def __init__(self, engine: TournamentEngine, group: str = GROUP, port: int = GROUP_PORT,
+               control_port: int = CONTROL_PORT, host: str = "0.0.0.0"):
+    self.engine = engine
+    self.group = (group, port)
+    self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    self.sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1) # stay on the LAN
+    self.sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1) # displays on this machine
+    self.control = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self.control.bind((host, control_port))
+    self.lock = threading.Lock() # engine events come from the GUI thread, keyframes from the control thread
+    self.seq = 0
+    self.sent_state = {}
+    self.hashed = (None, None) # (schedule, hash), the schedule is replaced whenever the config changes
+    self.sent_bytes = 0
+    self.messages = 0
+    self.send_errors = 0
+
+  def start(self):
+    self.engine.listeners.append(self.on_engine_event)
+    threading.Thread(target=self.run, daemon=True).start()
+
+  def state(self) -> dict:
+    engine = self.engine
+    if self.hashed[0] is not engine.schedule:
+      self.hashed = (engine.schedule, config_hash(engine.config))
+    return {"position": engine.position,
+            "deadline": engine.clock.deadline,
+            "remaining": None if engine.is_running else engine.clock.remaining_at_stop,
+            "started": engine.started,
+            "paused_at": engine.pause_started,
+            "created": engine.created_at,
+            "config": self.hashed[1]}
+
+  def message(self, kind: str) -> dict:
+    # keyframes carry every field, deltas only what changed since the last message
+    state = self.state()
+    self.seq += 1
+    if kind == "key":
+      body = state
+    else:
+      body = {name: val for name, val in state.items() if self.sent_state.get(name) != val}
+    self.sent_state = state
+    return {"seq": self.seq, "kind": kind, "state": body}
+
+  def send(self, kind: str):
+    with self.lock:
+      data = json.dumps(self.message(kind), separators=(",", ":")).encode()
+      try:
+        self.sender.sendto(data, self.group)
+      except OSError as e: # e.g. no multicast route, called from engine listeners on the GUI thread
+        if not self.send_errors:
+          print(f"Fanout to {self.group[0]} failed: {e!r}")
+        self.send_errors += 1
+        return
+      self.sent_bytes += len(data)
+      self.messages += 1
+
+  def on_engine_event(self, event: EngineEvent):
+    self.send(event.kind)
+
+  def run(self):
+    next_key = time.monotonic()
+    while True:
+      timeout = next_key - time.monotonic()
+      if timeout <= 0:
+        self.send("key")
+        next_key += KEYFRAME_S
+        continue
+      if not select.select([self.control], [], [], timeout)[0]:
+        continue
+      try:
+        data, address = self.control.recvfrom(MAX_DATAGRAM)
+      except OSError:
+        continue
+      try:
+        reply = self.handle(json.loads(data))
+      except (ValueError, KeyError, TypeError) as e: # ValueError: not json, or not even utf-8
+        reply = {"op": "error", "error": repr(e)}
+      data = json.dumps(reply, separators=(",", ":")).encode()
+      if len(data) > MAX_DATAGRAM:
+        data = json.dumps({"op": "error", "error": "config does not fit in a datagram"}).encode()
+      try:
+        self.control.sendto(data, address)
+      except OSError: # the display asks again
+        pass
+
+  def handle(self, request: dict) -> dict:
+    if not isinstance(request, dict):
+      raise TypeError(f"request must be an object, got {request!r}")
+    if request["op"] == "ping":
+      return {"op": "pong", "t": request["t"], "now": time.monotonic()}
+    if request["op"] == "state":
+      with self.lock:
+        return {"op": "state", "state": self.state(), "seq": self.seq}
+    if request["op"] == "config":
+      return {"op": "config", "hash": self.state()["config"], "config": dump_config_to_json(self.engine.config)}
+    raise KeyError(request["op"])
+
+
+class FanoutClient:
+  # Receives the authority's state on a thread, the GUI applies it with poll() on its own thread.
+  # The countdown runs locally against the authority deadline shifted by the estimated clock offset.
+  def __init__(self, authority: str, group: str = GROUP, port: int = GROUP_PORT,
+               control_port: int = CONTROL_PORT, library: ConfigLibrary | None = None):
+    self.authority = (authority, control_port)
+    self.library = library
+    self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    self.receiver.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # several displays on one machine
+    self.receiver.bind(("", port))
+    self.receiver.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                             struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton("0.0.0.0")))
+    self.control = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self.control.connect(self.authority)
+    self.inbox = queue.Queue()
+    self.offset = None # authority monotonic - local monotonic
+    self.rtt = None
+    self.seq = None
+    self.state = {}
+    self.configs: dict[str, PokerConfig] = {}
+    self.requested_config = None
+    self.hashed = (None, None) # (schedule, hash) of the config shown
+
+  def start(self):
+    threading.Thread(target=self.run, daemon=True).start()
+
+  # Network thread
+  def request(self, op: str, **fields):
+    try:
+      self.control.send(json.dumps({"op": op, **fields}).encode())
+    except OSError: # no authority yet, retried on the next sync
+      pass
+
+  def sync(self):
+    # NTP style: of a few pings, the one with the shortest round trip bounds the offset error by rtt / 2
+    best = None
+    for _ in range(SYNC_PINGS):
+      sent = time.monotonic()
+      self.request("ping", t=sent)
+      while select.select([self.control], [], [], SYNC_TIMEOUT_S)[0]:
+        message = self.receive(self.control)
+        if message is None or message.get("op") != "pong" or message["t"] != sent:
+          continue
+        now = time.monotonic()
+        if best is None or now - sent < best[0]:
+          best = (now - sent, message["now"] - (sent + now) / 2)
+        break
+    if best is not None:
+      self.rtt, self.offset = best
+      self.inbox.put({"op": "offset"})
+
+  def receive(self, sock: socket.socket) -> dict | None:
+    try:
+      message = json.loads(sock.recv(MAX_DATAGRAM))
+    except (OSError, ValueError): # ValueError: not json, or not even utf-8
+      return None
+    if not valid_message(message):
+      return None
+    if message.get("op") not in ("pong", None):
+      self.inbox.put(message) # state and config replies
+    return message
+
+  def run(self):
+    self.sync()
+    self.request("state")
+    next_sync = time.monotonic() + SYNC_INTERVAL_S
+    while True:
+      ready = select.select([self.receiver, self.control], [], [], max(0.0, next_sync - time.monotonic()))[0]
+      if not ready:
+        self.requested_config = None # retry a lost config reply
+        self.sync()
+        if self.seq is None:
+          self.request("state")
+        next_sync += SYNC_INTERVAL_S
+        continue
+      for sock in ready:
+        message = self.receive(sock)
+        if message is not None and sock is self.receiver:
+          self.inbox.put(message)
+
+  # GUI thread
+  def poll(self, engine: TournamentEngine) -> list[str]:
+    # applies received messages, returns the kinds of the ones that changed the engine
+    applied = []
+    while True:
+      try:
+        message = self.inbox.get_nowait()
+      except queue.Empty:
+        break
+      op = message.get("op")
+      if op == "config":
+        self.requested_config = None
+        try:
+          self.configs[message["hash"]] = self.to_config(message["config"])
+        except (ValueError, TypeError, KeyError) as e: # ScheduleError is a ValueError
+          print(f"Authority {self.authority[0]} sent an invalid config: {e!r}")
+          continue
+      elif op == "state":
+        self.seq = message["seq"]
+        self.state = message["state"]
+      elif op == "error":
+        print(f"Authority {self.authority[0]}: {message['error']}")
+        continue
+      elif op is None:
+        if message["kind"] == "key":
+          self.state = message["state"]
+        elif self.seq is not None and message["seq"] == self.seq + 1:
+          self.state = {**self.state, **message["state"]}
+        else:
+          self.seq = None # lost a delta, wait for the next keyframe
+          continue
+        self.seq = message["seq"]
+      if self.apply(engine):
+        kind = message.get("kind", op)
+        # replayed on the display's engine for its listeners (audio), a timeout already happened locally
+        engine.emit(kind if kind in REMOTE_EVENTS else "sync")
+        applied.append(kind)
+    return applied
+
+  def apply(self, engine: TournamentEngine) -> bool:
+    state = self.state
+    if self.offset is None or any(name not in state for name in STATE_FIELDS):
+      return False
+    config = self.config_for(state["config"], engine.config)
+    if config is None:
+      return False
+    return apply_published_state(engine, state, config, self.offset)
+
+  def config_for(self, digest: str, current: PokerConfig) -> PokerConfig | None:
+    if self.hashed[0] is not current.compiled():
+      self.hashed = (current.compiled(), config_hash(current))
+    if self.hashed[1] == digest:
+      return current
+    if digest in self.configs:
+      return self.configs[digest]
+    if self.requested_config != digest:
+      # the display's own config library first, the authority sends it otherwise
+      self.requested_config = digest
+      if self.library is not None:
+        self.library.scan()
+        for path in list(self.library.entries):
+          config = self.library.get(path)
+          if config and config_hash(config) == digest:
+            self.configs[digest] = config
+            return config
+      self.request("config")
+    return None
+
+  @staticmethod
+  def to_config(cdict: dict) -> PokerConfig:
+    errors = schema_errors(cdict)
+    if errors:
+      raise ScheduleError(str(cdict.get("NAME")), errors)
+    cdict = dict(cdict)
+    cdict["LEVEL_PERIOD"] = MyTime(*cdict["LEVEL_PERIOD"])
+    config = PokerConfig(**cdict)
+    config.compiled()
+    return config
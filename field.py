@@ -0,0 +1,132 @@
+import csv
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from engine import TournamentEngine
+from schedule import Level
+
+TABLE_SIZE = 9 # players dealt in per table, the antes of an orbit for the M-ratio
+KINDS = ("entry", "bust", "rebuy", "addon")
+
+
+class FieldDelta(NamedTuple):
+  # counts to add, negative ones undo a mistaken click
+  entries: int = 0
+  busts: int = 0
+  rebuys: int = 0
+  addons: int = 0
+
+
+def read_batch(path: Path) -> FieldDelta:
+  # registration desk export, one "kind[,count]" row per line, e.g. "entry,250" or "bust".
+  # Summed while reading, so applying a batch of any size is one O(1) update on the GUI thread
+  counts = dict.fromkeys(KINDS, 0)
+  with open(path, newline="") as f:
+    for number, row in enumerate(csv.reader(f), 1):
+      if not row or not row[0].strip() or row[0].startswith("#"):
+        continue
+      kind = row[0].strip().lower()
+      if kind not in counts:
+        raise ValueError(f"{path}:{number}: unknown kind {row[0]!r}, expected one of {KINDS}")
+      try:
+        counts[kind] += int(row[1]) if len(row) > 1 and row[1].strip() else 1
+      except ValueError:
+        raise ValueError(f"{path}:{number}: count {row[1]!r} is not an integer") from None
+  return FieldDelta(*counts.values())
+
+
+class FieldTracker:
+  # Running totals of the field, every entry, bust, rebuy and add-on is a constant time update.
+  # Chips are derived from the counts and the config, so an edited STARTING_CHIP_AMOUNT applies at once
+  def __init__(self, engine: TournamentEngine, table_size: int = TABLE_SIZE):
+    self.engine = engine
+    self.table_size = table_size
+    self.entries = 0
+    self.busts = 0
+    self.rebuys = 0
+    self.addons = 0
+    self.executor = ThreadPoolExecutor(max_workers=1) # batch files are parsed off the GUI thread
+
+  def apply(self, delta: FieldDelta):
+    entries, busts = self.entries + delta.entries, self.busts + delta.busts
+    rebuys, addons = self.rebuys + delta.rebuys, self.addons + delta.addons
+    if min(entries, busts, rebuys, addons) < 0 or busts > entries:
+      raise ValueError(f"{delta} leaves {entries - busts} of {entries} entries with {rebuys} rebuys and {addons} add-ons")
+    self.entries, self.busts, self.rebuys, self.addons = entries, busts, rebuys, addons
+
+  def register(self, count: int = 1):
+    self.apply(FieldDelta(entries=count))
+
+  def bust(self, count: int = 1):
+    self.apply(FieldDelta(busts=count))
+
+  def rebuy(self, count: int = 1):
+    self.apply(FieldDelta(rebuys=count))
+
+  def addon(self, count: int = 1):
+    self.apply(FieldDelta(addons=count))
+
+  def import_batch(self, path: Path) -> Future:
+    # the future's result is the FieldDelta to apply()
+    return self.executor.submit(read_batch, path)
+
+  # Aggregates
+  @property
+  def remaining(self) -> int:
+    return self.entries - self.busts
+
+  def chips_in_play(self) -> int:
+    config = self.engine.config
+    starting = config.STARTING_CHIP_AMOUNT
+    return (self.entries * starting + self.rebuys * (config.REBUY_CHIPS or starting) +
+            self.addons * (config.ADDON_CHIPS or starting))
+
+  def average_stack(self) -> float:
+    return self.chips_in_play() / self.remaining if self.remaining else 0.0
+
+  def blinds(self) -> Level | None:
+    # during a break the stacks are measured against the level after it
+    entry = self.engine.current_entry()
+    if entry.is_break:
+      return self.engine.schedule.next_level(self.engine.position)
+    return entry
+
+  def average_bb(self) -> float:
+    entry = self.blinds()
+    return self.average_stack() / entry.big_blind if entry is not None else 0.0
+
+  def m_ratio(self) -> float:
+    # average stack over the cost of one orbit: both blinds and an ante from every seated player
+    entry = self.blinds()
+    if entry is None:
+      return 0.0
+    return self.average_stack() / (entry.small_blind + entry.big_blind + entry.ante * min(self.table_size, self.remaining))
+
+  def text(self) -> str:
+    if not self.entries:
+      return "" # nobody registered, the display stays as it was
+    return f"{self.remaining}/{self.entries}  AVG {self.average_bb():.0f}BB  M {self.m_ratio():.1f}"
+
+  def stats(self) -> dict:
+    return {"entries": self.entries, "remaining": self.remaining, "rebuys": self.rebuys, "addons": self.addons,
+            "chips": self.chips_in_play(), "average_stack": round(self.average_stack()),
+            "average_bb": round(self.average_bb(), 1), "m_ratio": round(self.m_ratio(), 1)}
+
+
+if __name__ == "__main__":
+  # totals of registration batch files against a structure, e.g. before importing them at the venue
+  import argparse as argp
+  from config import load_config_from_json
+  parser = argp.ArgumentParser(description="Field totals of registration batch files")
+  parser.add_argument("batches", nargs="+", type=Path, help="Files with one kind[,count] row per line, kinds: " + ", ".join(KINDS))
+  parser.add_argument("-c", "--config", default=Path("configs/t10000.json"), type=Path)
+  parser.add_argument("-l", "--level", default=1, type=int, help="Level the averages are measured at")
+  args = parser.parse_args()
+  engine = TournamentEngine(load_config_from_json(args.config))
+  engine.get_state()
+  engine.position = engine.schedule.position_of_level(args.level)
+  field = FieldTracker(engine)
+  for path in args.batches:
+    field.apply(read_batch(path))
+  print(field.stats())
@@ -0,0 +1,111 @@
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import MyTime, PokerConfig, dump_config_to_json, format_config_json
+from schedule import compile_schedule
+
+# Scoring weights, a candidate's score is the weighted sum of its penalties (lower is better)
+WEIGHTS = {"increase": 4.0,     # per level increase outside [MIN_INCREASE, MAX_INCREASE]
+           "smoothness": 1.0,   # spread of the per level increases
+           "monotonic": 100.0,  # levels that do not go up after rounding
+           "final": 2.0,        # final big blind against the chips in play
+           "depth": 1.0}        # starting stack in big blinds
+MIN_INCREASE = 1.2
+MAX_INCREASE = 1.6
+FINAL_BB_SHARE = 1 / 15 # chips in play / 15: the last few players are short stacked
+START_DEPTH_BB = 75
+
+
+def round_blinds(bb: np.ndarray, chip_increment: int) -> np.ndarray:
+  # Round to two significant digits in units of 2 * CHIP_INCREMENT,
+  # so the small blind (bb / 2) stays a multiple of CHIP_INCREMENT
+  unit = 2 * chip_increment
+  units = np.maximum(bb / unit, 1.0)
+  step = 10.0 ** np.maximum(0, np.floor(np.log10(units)) - 1)
+  return (np.maximum(np.round(units / step), 1) * step * unit).astype(np.int64)
+
+
+def random_candidates(rng: np.random.Generator, n: int, levels: int,
+                      starting_stack: int, chip_increment: int) -> np.ndarray:
+  depth = rng.uniform(START_DEPTH_BB / 2, START_DEPTH_BB * 2, size=(n, 1))
+  increases = rng.uniform(1.1, 1.8, size=(n, levels - 1))
+  curves = (starting_stack / depth) * np.cumprod(np.hstack([np.ones((n, 1)), increases]), axis=1)
+  return round_blinds(curves, chip_increment)
+
+
+def score_candidates(bb: np.ndarray, starting_stack: int, players: int) -> np.ndarray:
+  increases = bb[:, 1:] / bb[:, :-1]
+  log_increases = np.log(increases)
+  penalties = {
+    "increase": (np.maximum(0, np.log(MIN_INCREASE) - log_increases) +
+                 np.maximum(0, log_increases - np.log(MAX_INCREASE))).sum(axis=1),
+    "smoothness": log_increases.std(axis=1),
+    "monotonic": (increases <= 1).sum(axis=1),
+    "final": np.abs(np.log(bb[:, -1] / (starting_stack * players * FINAL_BB_SHARE))),
+    "depth": np.abs(np.log(starting_stack / bb[:, 0] / START_DEPTH_BB)),
+  }
+  return sum(WEIGHTS[name] * penalty for name, penalty in penalties.items())
+
+
+def generate(starting_stack: int, chip_increment: int, duration_min: int, players: int,
+             level_minutes: int = 20, candidates: int = 100_000, best: int = 3,
+             batch: int = 25_000, seed: int | None = None) -> list[tuple[float, list[int]]]:
+  levels = max(2, round(duration_min / level_minutes))
+  rng = np.random.default_rng(seed)
+  top_scores = np.empty(0)
+  top_curves = np.empty((0, levels), dtype=np.int64)
+  for start in range(0, candidates, batch):
+    bb = random_candidates(rng, min(batch, candidates - start), levels, starting_stack, chip_increment)
+    scores = score_candidates(bb, starting_stack, players)
+    # keep only the running best, the batch arrays can be dropped
+    top_scores = np.concatenate([top_scores, scores])
+    top_curves = np.concatenate([top_curves, bb])
+    keep = np.argsort(top_scores)[:best * 10]
+    top_scores, top_curves = top_scores[keep], top_curves[keep]
+  _, unique = np.unique(top_curves, axis=0, return_index=True)
+  unique = unique[np.argsort(top_scores[unique])][:best]
+  return [(float(top_scores[i]), top_curves[i].tolist()) for i in unique]
+
+
+def to_config(name: str, starting_stack: int, chip_increment: int,
+              big_blinds: list[int], level_minutes: int) -> PokerConfig:
+  config = PokerConfig(NAME=name,
+                       STARTING_CHIP_AMOUNT=starting_stack,
+                       CHIP_INCREMENT=chip_increment,
+                       BIG_BLIND_VALUES=big_blinds,
+                       LEVEL_PERIOD=MyTime(level_minutes, 0))
+  compile_schedule(config) # never emit a structure the timer would reject
+  return config
+
+
+if __name__ == "__main__":
+  import argparse as argp
+  parser = argp.ArgumentParser(description="Search random blind structures and write the best as PokerConfig .json files")
+  parser.add_argument("-s", "--stack", required=True, type=int, help="STARTING_CHIP_AMOUNT")
+  parser.add_argument("-i", "--increment", required=True, type=int, help="CHIP_INCREMENT")
+  parser.add_argument("-d", "--duration", required=True, type=int, help="Target duration in minutes")
+  parser.add_argument("-p", "--players", required=True, type=int)
+  parser.add_argument("-l", "--level-minutes", default=20, type=int)
+  parser.add_argument("-n", "--candidates", default=100_000, type=int)
+  parser.add_argument("-k", "--best", default=3, type=int)
+  parser.add_argument("--seed", default=None, type=int)
+  parser.add_argument("-o", "--output", default=None, type=Path, help="Directory to write the configs to, print them otherwise")
+  args = parser.parse_args()
+
+  t0 = time.perf_counter()
+  results = generate(args.stack, args.increment, args.duration, args.players,
+                     args.level_minutes, args.candidates, args.best, seed=args.seed)
+  print(f"Scored {args.candidates} candidates in {time.perf_counter() - t0:.2f} s")
+  for rank, (score, big_blinds) in enumerate(results, start=1):
+    name = f"GEN-T{args.stack}-{args.players}P-{rank}"
+    cdict = dump_config_to_json(to_config(name, args.stack, args.increment, big_blinds, args.level_minutes))
+    text = format_config_json(cdict)
+    if args.output is None:
+      print(f"# score {score:.3f}\n{text}", end="")
+    else:
+      path = args.output / f"{name.lower()}.json"
+      with open(path, "w") as f:
+        f.write(text)
+      print(f"score {score:.3f} -> {path}")
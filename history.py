@@ -0,0 +1,252 @@
+import time
+from pathlib import Path
+
+from engine import EVENT_KINDS, EngineEvent, TournamentEngine
+
+# Every run is stored as three column tables in a .npz segment: runs (one row per tournament),
+# spans (one row per level or break played) and events (every engine event).
+# Queries load all segments and aggregate whole columns at once.
+HISTORY_DIR = Path("history")
+COMPACT_SEGMENTS = 32 # segments merged into one when a run finds more than this
+SOURCES = "merged.sources" # names of the segments a compacted one replaces, skipped if a crash left them behind
+KINDS = EVENT_KINDS
+MANUAL = ("next", "prev", "jump", "reset")
+# numpy dtypes, numpy itself is imported only when a run is written or queried (GUI startup)
+COLUMNS = {"runs": {"run": "int64", "name": "U", "config": "U", "started": "float64", "duration_s": "float64",
+                    "pauses": "int32", "pause_s": "float64", "manual": "int32", "finished": "bool"},
+           "spans": {"run": "int64", "level": "int16", "position": "int16", "is_break": "bool",
+                     "start_s": "float64", "wall_s": "float64", "pause_s": "float64",
+                     "planned_s": "int32", "ended_by": "int8"},
+           "events": {"run": "int64", "t": "float64", "kind": "int8", "level": "int16"}}
+
+
+class HistoryRecorder:
+  # Collects the spans and events of one run from engine events, written as a segment by close()
+  def __init__(self, directory: Path = HISTORY_DIR):
+    self.directory = Path(directory)
+    self.engine = None
+    self.config_path = ""
+    self.clear()
+
+  def clear(self):
+    self.run = None
+    self.name = None # NAME and file of the run, the config is replaced in place by the next one
+    self.run_config_path = None
+    self.t0 = None
+    self.started_wall = None
+    self.rows = {table: {name: [] for name in columns} for table, columns in COLUMNS.items()}
+    self.span = None # [level, position, is_break, start, pause_s, planned_s]
+    self.pause_started = None
+    self.pause_s = 0.0
+    self.pauses = 0
+    self.manual = 0
+
+  def attach(self, engine: TournamentEngine, config_path: Path | None = None):
+    self.engine = engine
+    self.config_path = "" if config_path is None else str(config_path)
+    engine.listeners.append(self.on_engine_event)
+    if engine.started:
+      # restored from a journal: its "start" came before this listener, the run goes on from here
+      self.start_run(engine.now())
+      self.begin_span(0.0)
+      if engine.pause_started is not None:
+        self.pause_started = 0.0
+        self.pauses += 1
+
+  def start_run(self, at: float):
+    self.t0 = at
+    self.started_wall = time.time()
+    self.run = time.time_ns() // 1000
+    self.name = self.engine.config.NAME
+    self.run_config_path = self.config_path
+
+  def begin_span(self, t: float):
+    entry = self.engine.current_entry()
+    self.span = [entry.level, self.engine.position, entry.is_break, t, 0.0, entry.duration_s]
+
+  def on_engine_event(self, event: EngineEvent):
+    if event.kind not in KINDS or (event.kind == "reset" and self.engine.loading):
+      return # the reset of a structure load belongs to neither run, its "config" follows
+    if event.kind == "config" and self.run is not None:
+      self.close() # a new structure is a new tournament
+    if self.run is None:
+      if event.kind != "start" and not (event.kind == "config" and self.engine.is_running):
+        return # nothing to record before the tournament starts
+      self.start_run(event.at)
+    t = event.at - self.t0
+    self.add("events", run=self.run, t=t, kind=KINDS.index(event.kind), level=event.level)
+    if event.kind == "pause":
+      self.pause_started = t
+      self.pauses += 1
+    elif event.kind == "start" and self.pause_started is not None:
+      self.pause_s += t - self.pause_started
+      self.span[4] += t - self.pause_started
+      self.pause_started = None
+    if event.kind in MANUAL:
+      self.manual += 1
+    if self.span is None or event.kind in ("timeout",) + MANUAL:
+      self.end_span(t, event.kind)
+      self.begin_span(t)
+    if event.kind == "finished":
+      self.close()
+
+  def end_span(self, t: float, kind: str):
+    if self.span is None:
+      return
+    level, position, is_break, start, pause_s, planned_s = self.span
+    if self.pause_started is not None: # level changed while paused, the rest of the pause is the next span's
+      pause_s += t - self.pause_started
+      self.pause_s += t - self.pause_started
+      self.pause_started = t
+    self.add("spans", run=self.run, level=level, position=position, is_break=is_break, start_s=start,
+             wall_s=t - start, pause_s=pause_s, planned_s=planned_s, ended_by=KINDS.index(kind))
+    self.span = None
+
+  def add(self, table: str, **row):
+    for name, val in row.items():
+      self.rows[table][name].append(val)
+
+  def close(self):
+    # end of the tournament or of the app, the run becomes a segment of the store
+    import numpy as np
+    if self.run is None:
+      return
+    t = self.engine.now() - self.t0
+    kind = "finished" if not self.engine.is_running and self.engine.position == len(self.engine.schedule)-1 else "sync"
+    self.end_span(t, kind)
+    if self.pause_started is not None:
+      self.pause_s += t - self.pause_started
+    self.add("runs", run=self.run, name=self.name, config=self.run_config_path, started=self.started_wall,
+             duration_s=t, pauses=self.pauses, pause_s=self.pause_s, manual=self.manual, finished=kind == "finished")
+    write_segment(self.directory, {table: {name: np.array(vals, dtype=COLUMNS[table][name])
+                                           for name, vals in columns.items()}
+                                   for table, columns in self.rows.items()})
+    self.clear()
+
+
+def write_segment(directory: Path, tables: dict) -> Path:
+  directory.mkdir(parents=True, exist_ok=True)
+  path = save(directory, tables)
+  if len(list(directory.glob("segment-*.npz"))) > COMPACT_SEGMENTS:
+    compact(directory)
+  return path
+
+
+def save(directory: Path, tables: dict, sources: list[str] = ()) -> Path:
+  # written under another name and renamed, a reader never sees half a segment
+  import numpy as np
+  path = directory / f"segment-{time.time_ns()}.npz"
+  tmp = directory / f"tmp-{path.name}"
+  columns = {f"{table}.{name}": column for table, columns in tables.items() for name, column in columns.items()}
+  if sources:
+    columns[SOURCES] = np.array(sources)
+  np.savez(tmp, **columns)
+  tmp.replace(path)
+  return path
+
+
+def load(directory: Path = HISTORY_DIR) -> dict:
+  # {table: {column: array}} over every segment
+  import numpy as np
+  parts = {table: {name: [] for name in columns} for table, columns in COLUMNS.items()}
+  segments, replaced = {}, set()
+  for path in sorted(Path(directory).glob("segment-*.npz")):
+    with np.load(path) as segment:
+      segments[path.name] = {key: segment[key] for key in segment.files}
+    replaced.update(segments[path.name].pop(SOURCES, np.empty(0)).tolist())
+  for segment_name, segment in segments.items():
+    if segment_name in replaced:
+      continue # already in a compacted segment, compact() did not get to delete it
+    for key, column in segment.items():
+      table, name = key.split(".", 1)
+      parts[table][name].append(column)
+  return {table: {name: np.concatenate(arrays) if arrays else np.empty(0, dtype=COLUMNS[table][name])
+                  for name, arrays in columns.items()}
+          for table, columns in parts.items()}
+
+
+def compact(directory: Path = HISTORY_DIR) -> int:
+  segments = sorted(Path(directory).glob("segment-*.npz"))
+  if len(segments) < 2:
+    return len(segments)
+  # the merged segment names the ones it replaces, a crash before they are deleted counts no run twice
+  save(Path(directory), load(directory), [segment.name for segment in segments])
+  for segment in segments:
+    segment.unlink()
+  return len(segments)
+
+
+# Queries
+def level_durations(history: dict, name: str) -> list[dict]:
+  # real minutes per level of every run of the structure NAME: wall clock, of which paused
+  import numpy as np
+  runs, spans = history["runs"], history["spans"]
+  run_ids = runs["run"][np.char.upper(runs["name"]) == name.upper()]
+  mask = np.isin(spans["run"], run_ids) & ~spans["is_break"]
+  levels = spans["level"][mask]
+  if not levels.size:
+    return []
+  count = np.bincount(levels)
+  wall = np.bincount(levels, weights=spans["wall_s"][mask])
+  paused = np.bincount(levels, weights=spans["pause_s"][mask])
+  planned = np.bincount(levels, weights=spans["planned_s"][mask])
+  return [{"level": level, "plays": int(count[level]),
+           "planned_min": round(planned[level] / count[level] / 60, 2),
+           "wall_min": round(wall[level] / count[level] / 60, 2),
+           "paused_min": round(paused[level] / count[level] / 60, 2)}
+          for level in np.flatnonzero(count)]
+
+
+def pauses_per_run(history: dict) -> list[dict]:
+  import numpy as np
+  runs = history["runs"]
+  order = np.argsort(runs["started"])
+  return [{"started": time.strftime("%Y-%m-%d %H:%M", time.localtime(runs["started"][i])),
+           "name": str(runs["name"][i]), "pauses": int(runs["pauses"][i]),
+           "pause_min": round(float(runs["pause_s"][i]) / 60, 1),
+           "hours": round(float(runs["duration_s"][i]) / 3600, 2)}
+          for i in order]
+
+
+def structures(history: dict) -> list[dict]:
+  import numpy as np
+  runs = history["runs"]
+  names, index = np.unique(runs["name"], return_inverse=True)
+  def per_name(column: str) -> np.ndarray:
+    return np.bincount(index, weights=runs[column], minlength=len(names))
+  count = np.bincount(index, minlength=len(names))
+  finished, hours = per_name("finished"), per_name("duration_s") / count / 3600
+  pause_min, manual = per_name("pause_s") / count / 60, per_name("manual") / count
+  return [{"name": str(name), "runs": int(count[i]), "finished": int(finished[i]),
+           "mean_hours": round(hours[i], 2), "mean_pause_min": round(pause_min[i], 1), "mean_manual": round(manual[i], 1)}
+          for i, name in enumerate(names)]
+
+
+if __name__ == "__main__":
+  import argparse as argp
+  parser = argp.ArgumentParser(description="Query the tournament history store")
+  parser.add_argument("query", choices=("levels", "pauses", "structures", "compact"))
+  parser.add_argument("name", nargs="?", default=None, help="Structure NAME, for levels")
+  parser.add_argument("-d", "--directory", default=HISTORY_DIR, type=Path)
+  args = parser.parse_args()
+
+  t0 = time.perf_counter()
+  if args.query == "compact":
+    print(f"Merged {compact(args.directory)} segments")
+  else:
+    history = load(args.directory)
+    loaded = time.perf_counter()
+    if args.query == "levels":
+      if args.name is None:
+        parser.error("levels needs a structure NAME")
+      rows = level_durations(history, args.name)
+    elif args.query == "pauses":
+      rows = pauses_per_run(history)
+    else:
+      rows = structures(history)
+    if rows:
+      print("".join(f"{key:>16}" for key in rows[0]))
+      for row in rows:
+        print("".join(f"{val:>16}" for val in row.values()))
+    print(f"{len(history['runs']['run'])} runs, {len(history['events']['run'])} events: "
+          f"loaded in {(loaded - t0) * 1000:.1f} ms, query {(time.perf_counter() - loaded) * 1000:.1f} ms")
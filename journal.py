@@ -0,0 +1,151 @@
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from engine import EngineEvent, TournamentEngine
+
+FSYNC_INTERVAL_S = 0.5 # group commit: records queued in this window share one fsync
+SNAPSHOT_EVERY = 64 # records between snapshots
+MAX_JOURNAL_BYTES = 1 << 20 # the journal is truncated behind a snapshot once it grows past this
+
+
+class JournalState(NamedTuple):
+  kind: str
+  wall: float # time.time() of the record, the clock keeps running while the process is down
+  position: int
+  remaining: float
+  running: bool
+  created_wall: float
+  pause_wall: float | None
+  config: str | None
+
+
+class Journal:
+  # Append-only log of tournament state transitions (JSON lines) with a snapshot file
+  # that points into it. Writes happen on a background thread, the GUI only enqueues.
+  def __init__(self, path: Path, fsync_interval_s: float = FSYNC_INTERVAL_S):
+    self.path = Path(path)
+    self.snapshot_path = self.path.with_name(self.path.name + ".snap")
+    self.fsync_interval_s = fsync_interval_s
+    self.config_path = None
+    self.queue = queue.Queue()
+    self.thread = None
+
+  # Writing
+  def attach(self, engine: TournamentEngine):
+    self.engine = engine
+    engine.listeners.append(self.on_engine_event)
+    self.thread = threading.Thread(target=self.run, daemon=True)
+    self.thread.start()
+
+  def on_engine_event(self, event: EngineEvent):
+    self.record(event.kind)
+
+  def record_config(self, path: Path):
+    self.config_path = str(Path(path).resolve())
+    self.record("config_load")
+
+  def record(self, kind: str):
+    engine = self.engine
+    now_mono, now_wall = engine.now(), time.time()
+    self.queue.put(JournalState(kind, now_wall, engine.position, engine.clock.remaining(), engine.is_running,
+                                now_wall - (now_mono - engine.created_at),
+                                None if engine.pause_started is None else now_wall - (now_mono - engine.pause_started),
+                                self.config_path))
+
+  def close(self):
+    if self.thread is not None:
+      self.queue.put(None)
+      self.thread.join()
+      self.thread = None
+
+  def run(self):
+    with open(self.path, "ab") as f:
+      since_snapshot = 0
+      last = None
+      while True:
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.fsync_interval_s
+        while batch[-1] is not None and (timeout := deadline - time.monotonic()) > 0:
+          try:
+            batch.append(self.queue.get(timeout=timeout))
+          except queue.Empty:
+            break
+        stop = batch[-1] is None
+        records = [state for state in batch if state is not None]
+        if records:
+          f.write(b"".join(json.dumps(state._asdict()).encode() + b"\n" for state in records))
+          f.flush()
+          os.fsync(f.fileno())
+          last = records[-1]
+          since_snapshot += len(records)
+        if last is not None and (since_snapshot >= SNAPSHOT_EVERY or stop):
+          offset = f.tell()
+          if offset > MAX_JOURNAL_BYTES:
+            self.write_snapshot(last, 0)
+            f.truncate(0)
+            f.seek(0)
+          else:
+            self.write_snapshot(last, offset)
+          since_snapshot = 0
+        if stop:
+          return
+
+  def write_snapshot(self, state: JournalState, offset: int):
+    tmp = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+    with open(tmp, "w") as f:
+      json.dump({"offset": offset, "state": state._asdict()}, f)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp, self.snapshot_path)
+
+  # Restoring
+  def restore(self) -> JournalState | None:
+    # latest state: the snapshot, then only the records written after it
+    state, offset = None, 0
+    try:
+      with open(self.snapshot_path, "r") as f:
+        snapshot = json.load(f)
+      state, offset = JournalState(**snapshot["state"]), snapshot["offset"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+      pass
+    try:
+      with open(self.path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+          try:
+            state = JournalState(**json.loads(line))
+          except (json.JSONDecodeError, TypeError):
+            break # torn last write
+    except FileNotFoundError:
+      pass
+    return state
+
+
+def apply_state(engine: TournamentEngine, state: JournalState):
+  # put the engine where the journal says it was, plus the wall time that passed since
+  now_mono, now_wall = engine.now(), time.time()
+  elapsed = engine.schedule.end_of(min(state.position, len(engine.schedule)-1)) - state.remaining
+  if state.running:
+    elapsed += now_wall - state.wall
+  engine.seek(elapsed)
+  engine.created_at = now_mono - (now_wall - state.created_wall)
+  if state.running:
+    engine.start()
+  elif state.pause_wall is not None:
+    engine.pause_started = now_mono - (now_wall - state.pause_wall)
+    engine.started = True
+
+
+if __name__ == "__main__":
+  import argparse as argp
+  parser = argp.ArgumentParser(description="Print the state a tournament journal restores to")
+  parser.add_argument("journal", type=Path)
+  args = parser.parse_args()
+  t0 = time.perf_counter()
+  print(Journal(args.journal).restore())
+  print(f"restored in {(time.perf_counter() - t0) * 1000:.2f} ms")
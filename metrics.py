@@ -0,0 +1,164 @@
+import bisect
+import csv
+import functools
+import threading
+import time
+from pathlib import Path
+
+# upper bounds of the histogram buckets, the last bucket catches everything above
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+STALE_FACTOR = 10 # a gap this many intervals long means a stop nobody reset() for, not lateness
+CSV_INTERVAL_S = 60
+PREFIX = "poker_timer"
+
+
+class Histogram:
+  # fixed buckets, an observation is a bisect and three additions
+  __slots__ = ("counts", "count", "sum", "max")
+
+  def __init__(self):
+    self.counts = [0] * (len(BUCKETS_MS) + 1)
+    self.count = 0
+    self.sum = 0.0
+    self.max = 0.0
+
+  def observe(self, ms: float):
+    self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+    self.count += 1
+    self.sum += ms
+    if ms > self.max:
+      self.max = ms
+
+  def quantile(self, q: float) -> float:
+    # upper bound of the bucket holding the q-th observation
+    if not self.count:
+      return 0.0
+    rank = q * self.count
+    seen = 0
+    for bound, n in zip(BUCKETS_MS, self.counts):
+      seen += n
+      if seen >= rank:
+        return min(bound, self.max)
+    return self.max
+
+
+class Metrics:
+  # histograms keyed by (metric, label), e.g. ("timer_lateness_ms", "round_timer")
+  def __init__(self):
+    self.histograms: dict[tuple[str, str], Histogram] = {}
+    self.server = None
+    self.csv_thread = None
+
+  def histogram(self, metric: str, label: str) -> Histogram:
+    hist = self.histograms.get((metric, label))
+    if hist is None:
+      hist = self.histograms[(metric, label)] = Histogram()
+    return hist
+
+  def observe(self, metric: str, label: str, ms: float):
+    self.histogram(metric, label).observe(ms)
+
+  # Instrumentation
+  def timed(self, label: str, fn):
+    # callback duration of a slot
+    hist = self.histogram("callback_duration_ms", label)
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+      start = time.perf_counter()
+      try:
+        return fn(*args, **kwargs)
+      finally:
+        hist.observe((time.perf_counter() - start) * 1000)
+    return wrapper
+
+  def periodic(self, label: str, interval_ms: int, fn):
+    # lateness of a periodic timer against its previous timeout, plus the callback duration
+    lateness = self.histogram("timer_lateness_ms", label)
+    # wrapper.reset() when the timer is (re)started, the gap since its last timeout is not lateness
+    timed = self.timed(label, fn)
+    last = None
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+      nonlocal last
+      now = time.perf_counter()
+      if last is not None:
+        late_ms = (now - last) * 1000 - interval_ms
+        if late_ms < interval_ms * STALE_FACTOR:
+          lateness.observe(max(0.0, late_ms))
+      last = now
+      return timed(*args, **kwargs)
+    def reset():
+      nonlocal last
+      last = None
+    wrapper.reset = reset
+    return wrapper
+
+  # Exposition
+  def render(self) -> str:
+    # Prometheus text format
+    lines = []
+    typed = set()
+    for (metric, label), hist in sorted(list(self.histograms.items())):
+      name = f"{PREFIX}_{metric}"
+      if metric not in typed:
+        lines.append(f"# TYPE {name} histogram")
+        typed.add(metric)
+      cumulative = 0
+      for bound, n in zip(BUCKETS_MS + ("+Inf",), list(hist.counts)):
+        cumulative += n
+        lines.append(f'{name}_bucket{{name="{label}",le="{bound}"}} {cumulative}')
+      lines.append(f'{name}_sum{{name="{label}"}} {hist.sum:.3f}')
+      lines.append(f'{name}_count{{name="{label}"}} {hist.count}')
+    return "\n".join(lines) + "\n"
+
+  def rows(self) -> list[dict]:
+    return [{"metric": metric, "name": label, "count": hist.count,
+             "mean_ms": round(hist.sum / hist.count, 3) if hist.count else 0.0,
+             "p50_ms": round(hist.quantile(0.5), 3), "p95_ms": round(hist.quantile(0.95), 3),
+             "p99_ms": round(hist.quantile(0.99), 3),
+             "max_ms": round(hist.max, 3)}
+            for (metric, label), hist in sorted(list(self.histograms.items()))]
+
+  def serve(self, port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # only with --metrics-port, keeps startup short
+    metrics = self
+    class Handler(BaseHTTPRequestHandler):
+      def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+          self.send_error(404)
+          return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+      def log_message(self, format, *args):
+        pass
+    self.server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    return self.server
+
+  def dump_csv(self, path: Path):
+    # appends a row per histogram, cumulative since start
+    path = Path(path)
+    new = not path.exists()
+    wall = time.strftime("%Y-%m-%dT%H:%M:%S")
+    rows = self.rows()
+    with open(path, "a", newline="") as f:
+      writer = csv.DictWriter(f, ["time", "metric", "name", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+      if new:
+        writer.writeheader()
+      writer.writerows({"time": wall, **row} for row in rows)
+
+  def start_csv(self, path: Path, interval_s: float = CSV_INTERVAL_S):
+    def run():
+      while True:
+        time.sleep(interval_s)
+        self.dump_csv(path)
+    self.csv_thread = threading.Thread(target=run, daemon=True)
+    self.csv_thread.start()
+
+
+METRICS = Metrics()
@@ -0,0 +1,230 @@
+import time
+from collections import OrderedDict
+
+from PyQt5.QtCore import QRect, Qt
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPainter, QPixmap
+from PyQt5.QtWidgets import QWidget
+
+from metrics import METRICS
+from utils import DisplayTexts, MyFonts, PokerGameState, sized_font
+
+# name: (font, cell row, column, row span, column span as in MainWindowDisplay's grid, alignment, boxed)
+SLOTS = {"round_timer": (MyFonts.Timer, 0, 2, 4, 3, Qt.AlignCenter, True),
+         "break_timer": (MyFonts.Timer, 3, 2, 1, 3, Qt.AlignBottom | Qt.AlignHCenter, False),
+         "total_timer": (MyFonts.Timer, 0, 2, 1, 3, Qt.AlignTop | Qt.AlignHCenter, False),
+         "blinds": (MyFonts.Blinds, 0, 0, 4, 2, Qt.AlignCenter, True),
+         "level": (MyFonts.Blinds, 0, 0, 1, 2, Qt.AlignTop | Qt.AlignHCenter, False),
+         "next_blinds": (MyFonts.Blinds, 3, 0, 1, 2, Qt.AlignBottom | Qt.AlignHCenter, False),
+         "field": (MyFonts.Blinds, 2, 0, 1, 2, Qt.AlignBottom | Qt.AlignHCenter, False)}
+GRID_ROWS, GRID_COLUMNS = 4, 5
+MARGIN_PX = 11 # QGridLayout's default contents margin
+BOX_BORDER_PX = 5
+BOX_COLOR = QColor(40, 40, 40, int(0.7 * 255))
+TEXT_COLOR = QColor("white")
+ATLAS_CACHE_SIZE = 2 * len(SLOTS) # the sizes on screen and the ones before them, a resize drag passes through hundreds
+
+
+class GlyphAtlas:
+  # One pixmap per character for a font size. The display fonts are monospaced,
+  # so a string is drawn glyph by glyph without shaping and characters map to fixed cells
+  def __init__(self, font: QFont, color: QColor = TEXT_COLOR, device_pixel_ratio: float = 1.0):
+    self.font = font
+    self.color = color
+    self.device_pixel_ratio = device_pixel_ratio
+    self.metrics = QFontMetrics(font)
+    self.height = self.metrics.height()
+    self.glyphs: dict[str, QPixmap] = {}
+    self.advances: dict[str, int] = {} # glyphs are rendered on first use
+
+  def advance(self, ch: str) -> int:
+    advance = self.advances.get(ch)
+    if advance is None:
+      advance = self.advances[ch] = self.metrics.horizontalAdvance(ch)
+    return advance
+
+  def glyph(self, ch: str) -> QPixmap:
+    pixmap = self.glyphs.get(ch)
+    if pixmap is None:
+      ratio = self.device_pixel_ratio
+      pixmap = QPixmap(max(1, int(self.advance(ch) * ratio)), max(1, int(self.height * ratio)))
+      pixmap.setDevicePixelRatio(ratio)
+      pixmap.fill(Qt.transparent)
+      painter = QPainter(pixmap)
+      painter.setFont(self.font)
+      painter.setPen(self.color)
+      painter.drawText(0, self.metrics.ascent(), ch)
+      painter.end()
+      self.glyphs[ch] = pixmap
+    return pixmap
+
+  def width(self, text: str) -> int:
+    return sum(self.advance(ch) for ch in text)
+
+
+GLYPH_ATLASES: OrderedDict[tuple, GlyphAtlas] = OrderedDict() # least recently used first
+
+def glyph_atlas(font: QFont, device_pixel_ratio: float) -> GlyphAtlas:
+  key = (font.key(), device_pixel_ratio)
+  atlas = GLYPH_ATLASES.get(key)
+  if atlas is None:
+    atlas = GLYPH_ATLASES[key] = GlyphAtlas(font, device_pixel_ratio=device_pixel_ratio)
+    if len(GLYPH_ATLASES) > ATLAS_CACHE_SIZE:
+      GLYPH_ATLASES.popitem(last=False)
+  else:
+    GLYPH_ATLASES.move_to_end(key)
+  return atlas
+
+
+class PaintedDisplay(DisplayTexts, QWidget):
+  # MainWindowDisplay drawn by one widget: text is blitted from glyph atlases and
+  # a text change only invalidates the characters that changed
+  def __init__(self, parent: QWidget, current_state: PokerGameState) -> None:
+    super().__init__(parent)
+    self.current_state = current_state
+    self.setObjectName("MainWindowDisplay")
+    self.fonts = {name: slot[0] for name, slot in SLOTS.items()}
+    self.atlases = {}
+    self.cells: dict[str, QRect] = {}
+    self.rendered_texts = {name: "" for name in SLOTS}
+    self.rendered_texts["round_timer"] = "0:0"
+    self.rendered_texts["total_timer"] = "0:00:00"
+    self.repaint_counts = {name: {"performed": 0, "skipped": 0} for name in SLOTS}
+    self.paint_ms = METRICS.histogram("repaint_ms", "painted_display")
+
+  def atlas(self, name: str) -> GlyphAtlas:
+    atlas = self.atlases.get(name)
+    if atlas is None:
+      atlas = self.atlases[name] = glyph_atlas(self.fonts[name], self.devicePixelRatioF())
+    return atlas
+
+  # Geometry
+  def resizeEvent(self, event) -> None:
+    area = self.rect().adjusted(MARGIN_PX, MARGIN_PX, -MARGIN_PX, -MARGIN_PX)
+    column_w, row_h = area.width() / GRID_COLUMNS, area.height() / GRID_ROWS
+    for name, (_, row, column, rows, columns, _, _) in SLOTS.items():
+      self.cells[name] = QRect(int(area.x() + column * column_w), int(area.y() + row * row_h),
+                               int(columns * column_w), int(rows * row_h))
+
+  def text_origin(self, name: str, text: str) -> tuple[int, int]:
+    # inside the 5 px border every MyLabel has
+    cell = self.cells[name].adjusted(BOX_BORDER_PX, BOX_BORDER_PX, -BOX_BORDER_PX, -BOX_BORDER_PX)
+    align, atlas = SLOTS[name][5], self.atlas(name)
+    x = cell.x() + (cell.width() - atlas.width(text)) // 2
+    if align & Qt.AlignTop:
+      y = cell.y()
+    elif align & Qt.AlignBottom:
+      y = cell.bottom() - atlas.height
+    else:
+      y = cell.y() + (cell.height() - atlas.height) // 2
+    return x, y
+
+  def text_rect(self, name: str, text: str) -> QRect:
+    x, y = self.text_origin(name, text)
+    return QRect(x, y, self.atlas(name).width(text), self.atlas(name).height)
+
+  def dirty_rect(self, name: str, old: str, new: str) -> QRect:
+    # same length and width: only the cells of the characters that differ, e.g. the last digit of the clock
+    atlas = self.atlas(name)
+    if len(old) != len(new) or atlas.width(old) != atlas.width(new):
+      return self.text_rect(name, old) | self.text_rect(name, new)
+    x, y = self.text_origin(name, new)
+    dirty = QRect()
+    for a, b in zip(old, new):
+      if a != b:
+        dirty |= QRect(x, y, atlas.advance(b), atlas.height)
+      x += atlas.advance(b)
+    return dirty
+
+  # Display API shared with MainWindowDisplay
+  def update_fonts(self, font_sizes: dict) -> int:
+    changed = 0
+    for name, val in font_sizes.items():
+      name = name.lower()
+      if name in self.fonts and self.fonts[name].pointSize() != val:
+        self.fonts[name] = sized_font(self.fonts[name], val)
+        self.atlases.pop(name, None)
+        changed += 1
+    if changed:
+      self.update()
+    return changed
+
+  def set_label_text(self, name: str, text: str) -> bool:
+    old = self.rendered_texts[name]
+    if old == text:
+      self.repaint_counts[name]["skipped"] += 1
+      return False
+    self.rendered_texts[name] = text
+    self.repaint_counts[name]["performed"] += 1
+    if self.cells:
+      self.update(self.dirty_rect(name, old, text))
+    return True
+
+  def paintEvent(self, event) -> None:
+    t0 = time.perf_counter()
+    dirty = event.rect()
+    painter = QPainter(self)
+    for name, slot in SLOTS.items():
+      if slot[6] and self.cells[name].intersects(dirty):
+        painter.fillRect(self.cells[name].adjusted(BOX_BORDER_PX, BOX_BORDER_PX, -BOX_BORDER_PX, -BOX_BORDER_PX), BOX_COLOR)
+    for name, text in self.rendered_texts.items():
+      if not text or not self.text_rect(name, text).intersects(dirty):
+        continue
+      atlas = self.atlas(name)
+      x, y = self.text_origin(name, text)
+      for ch in text:
+        advance = atlas.advance(ch)
+        if dirty.intersects(QRect(x, y, advance, atlas.height)):
+          painter.drawPixmap(x, y, atlas.glyph(ch))
+        x += advance
+    painter.end()
+    self.paint_ms.observe((time.perf_counter() - t0) * 1000)
+
+
+if __name__ == "__main__":
+  # Frame time of a clock tick for both renderers: update_texts and the repaint it causes
+  import argparse as argp
+  import os
+  import sys
+  from pathlib import Path
+  parser = argp.ArgumentParser(description="Compare tick frame times of the label and painted main display")
+  parser.add_argument("-g", "--geometry", default="UHD")
+  parser.add_argument("-t", "--ticks", default=600, type=int)
+  parser.add_argument("-c", "--config", default=Path("configs/t10000.json"), type=Path)
+  args = parser.parse_args()
+  os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+  from PyQt5.QtWidgets import QApplication
+  app = QApplication(sys.argv)
+  from clock import DeadlineClock, VirtualClock
+  from config import load_config_from_json
+  from engine import TournamentEngine
+  from utils import (BackgroundWidget, MainWindowDisplay, WindowGeometry, main_window_font_sizes,
+                     setupQFontDataBase, width_bucket)
+  setupQFontDataBase()
+  geometry = getattr(WindowGeometry, args.geometry).value
+  _, font_sizes = main_window_font_sizes(width_bucket(geometry.width()))
+  for display_class in (MainWindowDisplay, PaintedDisplay):
+    clock = VirtualClock()
+    engine = TournamentEngine(load_config_from_json(args.config), DeadlineClock(clock))
+    engine.get_state()
+    engine.start()
+    background = BackgroundWidget()
+    background.set_image(Path("images/bg.jpg"))
+    background.resize(geometry)
+    display = display_class(background, engine)
+    display.resize(geometry)
+    display.update_fonts(font_sizes)
+    background.show()
+    display.update_texts(0)
+    app.processEvents()
+    frames = []
+    for tick in range(args.ticks):
+      clock.advance(1.0)
+      engine.update_from_clock()
+      t0 = time.perf_counter()
+      display.update_texts(0)
+      app.processEvents() # paints what the updates invalidated
+      frames.append((time.perf_counter() - t0) * 1000)
+    frames.sort()
+    print(f"{display_class.__name__:<20} {args.geometry} {args.ticks} ticks: mean {sum(frames) / len(frames):.3f} ms, "
+          f"p50 {frames[len(frames) // 2]:.3f} ms, p95 {frames[int(0.95 * (len(frames) - 1))]:.3f} ms")
+    background.close()
@@ -1,47 +1,160 @@
+from startup import STARTUP # first, so the startup report covers the imports below
+import sys
+if __name__ == "__main__" and "--terminal" in sys.argv[1:]:
+  # curses front end for headless boxes, dispatched before PyQt5 and pygame are imported
+  import terminal
+  sys.exit(terminal.main(sys.argv[1:]))
 import datetime
+import functools
 # to close MainWindow/QApp with Ctrl+C
 import signal
-import time
 from pathlib import Path
 
 from typing import Optional
 
-from PyQt5.QtCore import QSize, QTimer
-from PyQt5.QtWidgets import QApplication, QGridLayout, QMainWindow, QWidget, QRadioButton
-
-from settings_window import SettingsWindow
+from PyQt5.QtCore import QFileSystemWatcher, QSize, Qt, QTimer
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtWidgets import QApplication, QFileDialog, QGridLayout, QMainWindow, QShortcut, QRadioButton
+
+from config_library import ConfigLibrary
+from engine import EngineEvent
+from fanout import FanoutClient, FanoutServer
+from field import FieldDelta, FieldTracker
+from history import HistoryRecorder
+from journal import Journal, apply_state
+from metrics import METRICS
+from profiler import PROFILER
+from sharedclock import SharedClockPublisher, SharedClockReader
 from utils import *
 
+STARTUP.mark("imports")
 signal.signal(signal.SIGINT, signal.SIG_DFL)
 
+PREWARM_DELAY_MS = 250 # build the settings window once the main display is up
+FOLLOW_POLL_MS = 20 # how often a LAN display applies what the authority sent
+SHARED_POLL_MS = 16 # local displays and the authority's command inbox, once a frame
+# main window button: command a local display sends to the authority instead
+SHARED_COMMANDS = {"StartStop": "toggle", "Reset": "reset", "PrevLvl": "prev", "NextLvl": "next"}
+IMPORT_POLL_MS = 100
+# key: (FieldDelta field, count), Shift undoes the same key
+FIELD_KEYS = {"E": ("entries", 1), "B": ("busts", 1), "R": ("rebuys", 1), "A": ("addons", 1)}
+
 class PokerTimer():
   def __init__(self,
                geometry : QSize = WindowGeometry.FHD.value,
                max_geometry : QSize = WindowGeometry.UHD.value,
-               time_step_ms : int = 10,
-               config_path: Optional[Path] = None
+               config_path: Optional[Path] = None,
+               lazy: bool = True,
+               library: Optional[ConfigLibrary] = None,
+               journal_path: Optional[Path] = None,
+               renderer: str = "labels",
+               serve_lan: bool = False,
+               follow: Optional[str] = None,
+               history_dir: Optional[Path] = None,
+               serve_local: Optional[str] = None,
+               follow_local: Optional[str] = None
                ):
     config_path = Path("configs/t10000.json") if config_path is None else config_path
+    # Crash recovery: the journal knows the structure and clock position of the last run
+    self.journal = None
+    restored = None
+    if journal_path is not None:
+      with STARTUP.phase("restore journal"):
+        self.journal = Journal(journal_path)
+        restored = self.journal.restore()
+      if restored is not None and restored.config is not None and Path(restored.config).exists():
+        config_path = Path(restored.config)
     if not config_path.exists():
       raise ValueError(f"Config file {config_path.absolute()} does not exist!")
 
-    self.cfg = load_config_from_json(config_path)
-
-    self.settings_window = SettingsWindow(self.cfg)
-    self.main_window = QMainWindow()
-    self.current_state = PokerGameState(self.cfg)
-
-    # Time counters
-    self.sec_cnt = 0
-    self.time_step_ms = time_step_ms
-    self.total_time = time.time()
-    self.break_time = 0
+    with STARTUP.phase("load config"):
+      self.library = ConfigLibrary() if library is None else library
+      self.cfg = self.library.get(config_path)
+      if not self.cfg:
+        raise ValueError(f"Invalid config {config_path.absolute()}: {self.library.errors().get(config_path.resolve())}")
+
+    self.renderer = renderer
+    self._settings_window = None
+    with STARTUP.phase("game state"):
+      self.main_window = QMainWindow()
+      self.current_state = PokerGameState(self.cfg, load_sounds_async=lazy, audio=follow_local is None)
+      if restored is not None:
+        self.cfg.NEW = False # keep the restored level instead of resetting on the first refresh
+        apply_state(self.current_state, restored)
+        print(f"Restored {self.cfg.NAME} level {self.current_state.current_level} from {journal_path}")
+      if self.journal is not None:
+        self.journal.attach(self.current_state)
+    if not lazy:
+      self.prewarm() # the settings window follows the game state's clock
+    # Level timings, pauses and level changes of every run, for history.py queries
+    self.history = None
+    if history_dir is not None and follow is None and follow_local is None:
+      self.history = HistoryRecorder(history_dir)
+      self.history.attach(self.current_state, config_path)
+    # Entrants, busts, rebuys and add-ons, shown under the blinds
+    self.field = FieldTracker(self.current_state)
+    self.field_imports = []
+    # LAN displays: the authority multicasts its state, a follower only shows the authority's clock
+    self.fanout = None
+    self.follower = None
+    if serve_lan:
+      self.fanout = FanoutServer(self.current_state)
+      self.fanout.start()
+    if follow is not None:
+      self.follower = FanoutClient(follow, library=self.library)
+      self.follower.start()
+    # Displays on this machine: one process owns the clock, the others render from its shared memory segment
+    self.clock_publisher = None
+    self.clock_reader = None
+    if serve_local is not None:
+      self.clock_publisher = SharedClockPublisher(self.current_state, self.field, serve_local)
+      self.clock_publisher.start()
+    if follow_local is not None:
+      self.clock_reader = SharedClockReader(follow_local, field=self.field)
+    self.remote_clock = self.follower if self.follower is not None else self.clock_reader
+
+    # Hot reload of the structure file the running tournament uses
+    self.config_watcher = QFileSystemWatcher()
+    self.config_watcher.fileChanged.connect(self.reload_config)
+    self.watch_config(config_path)
 
     # Constraint the MV, setup and show
     self.main_window.setMaximumHeight(max_geometry.height())
     self.main_window.setMaximumWidth(max_geometry.width())
-    self.setup_window(geometry)
-    self.main_window.show()
+    with STARTUP.phase("setup window"):
+      self.setup_window(geometry)
+    self.sync_timers()
+    self.current_state.listeners.append(self.on_engine_event)
+    if self.follower is not None:
+      self.mv_controls.setHidden(True)
+      self.check.setHidden(True)
+    if self.remote_clock is not None:
+      self.follow_timer = QTimer(self.main_layout)
+      self.follow_timer.setTimerType(Qt.PreciseTimer)
+      self.follow_timer.timeout.connect(self.apply_remote_state)
+      self.follow_timer.start(FOLLOW_POLL_MS if self.follower is not None else SHARED_POLL_MS)
+    if self.clock_publisher is not None:
+      self.command_timer = QTimer(self.main_layout)
+      self.command_timer.timeout.connect(self.serve_local_commands)
+      self.command_timer.start(SHARED_POLL_MS)
+    with STARTUP.phase("show"):
+      self.main_window.show()
+    if lazy:
+      QTimer.singleShot(PREWARM_DELAY_MS, self.prewarm)
+
+  @property
+  def settings_window(self):
+    if self._settings_window is None:
+      with STARTUP.phase("settings window"):
+        from settings_window import SettingsWindow # pulls in pyqtgraph
+        self.library.scan()
+        self._settings_window = SettingsWindow(self.cfg, library=self.library, engine=self.current_state)
+        self._settings_window.config_loaded.connect(self.watch_config)
+        self._settings_window.config_edited.connect(self.apply_config_edit)
+    return self._settings_window
+
+  def prewarm(self):
+    return self.settings_window
 
   def setup_window(self,
                    geometry : QSize = WindowGeometry.FHD.value):
@@ -49,23 +162,31 @@ class PokerTimer():
     self.main_window.setObjectName("MainWindow")
     self.main_window.setWindowTitle("Poker Timer")
     self.main_window.resize(geometry)
-    self.central_widget = QWidget()
+    self.central_widget = BackgroundWidget()
     self.set_background_img()
     self.main_layout = QGridLayout(self.central_widget)
     self.main_window.setCentralWidget(self.central_widget)
 
     # QFontDataBase
-    self.qfontdb = setupQFontDataBase()
+    with STARTUP.phase("fonts"):
+      self.qfontdb = setupQFontDataBase()
     #QTWidgets
     # Timer
     self.update_timer = QTimer(self.main_layout)
     self.update_timer.start(100)
     self.round_timer = QTimer(self.main_layout)
+    self.round_timer.setSingleShot(True) # rescheduled to the next second boundary on every wakeup
+    self.round_timer.setTimerType(Qt.PreciseTimer)
     self.total_timer = QTimer(self.main_layout)
     self.total_timer.start(1000) # each second update
     self.break_timer = QTimer(self.main_layout)
 
-    self.mv_display = MainWindowDisplay(self.central_widget, self.current_state)
+    if self.renderer == "painted":
+      from painted_display import PaintedDisplay
+      self.mv_display = PaintedDisplay(self.central_widget, self.current_state)
+    else:
+      self.mv_display = MainWindowDisplay(self.central_widget, self.current_state)
+    self.mv_display.field = self.field
     self.mv_controls = MainWindowControls(self.central_widget)
 
     self.check = QRadioButton(self.central_widget)
@@ -86,97 +207,213 @@ class PokerTimer():
                          "PrevLvl": self.prev_level_button_action,
                          "NextLvl": self.next_level_button_action,
                          "StartStop": self.start_stop_round_timer}
+    # what the authority does when a local display sends the command of a button
+    self.shared_actions = {command: mv_control_clicks[button] for button, command in SHARED_COMMANDS.items()}
+    if self.clock_reader is not None:
+      for button, command in SHARED_COMMANDS.items():
+        mv_control_clicks[button] = functools.partial(self.clock_reader.send, command)
     self.mv_controls.connect_clicks(mv_control_clicks)
 
-    self.round_timer.timeout.connect(self.update_stats_every_sec)
-    self.update_timer.timeout.connect(self.update_mv_display_texts)
-    self.total_timer.timeout.connect(self.update_total_time)
-    self.break_timer.timeout.connect(self.update_break_time)
+    self.round_timer.timeout.connect(PROFILER.wrap("round_timer", METRICS.timed("round_timer", self.update_stats_every_sec)))
+    self.update_timer.timeout.connect(PROFILER.wrap("update_timer", METRICS.periodic("update_timer", 100, self.update_mv_display_texts)))
+    self.total_timer.timeout.connect(PROFILER.wrap("total_timer", METRICS.periodic("total_timer", 1000, self.update_total_time)))
+    self.break_tick = METRICS.periodic("break_timer", 1000, self.update_break_time)
+    self.break_timer.timeout.connect(PROFILER.wrap("break_timer", self.break_tick))
+
+    for key, (name, count) in FIELD_KEYS.items():
+      QShortcut(QKeySequence(key), self.main_window).activated.connect(
+        PROFILER.wrap(f"field {name}", lambda name=name, count=count: self.field_action(name, count)))
+      QShortcut(QKeySequence(f"Shift+{key}"), self.main_window).activated.connect(
+        PROFILER.wrap(f"field {name}", lambda name=name, count=count: self.field_action(name, -count)))
+    QShortcut(QKeySequence("Ctrl+I"), self.main_window).activated.connect(self.choose_registrations)
+    self.import_timer = QTimer(self.main_layout)
+    self.import_timer.timeout.connect(self.poll_imports)
 
     # Initialize texts
     self.update_mv_display_texts()
 
     # Resize Event
+    self.resize_coalescer = ResizeCoalescer(self.main_window, PROFILER.wrap("apply_resize", METRICS.timed("apply_resize", self.apply_resize)))
     self.main_window.resizeEvent = self.customResizeEvent
 
   # Event methods
   def customResizeEvent(self, event):
+    self.resize_coalescer.request()
+
+  def apply_resize(self):
     # Calculate font sizes based on window width and height
     width = self.main_window.width()
     if width >= self.main_window.maximumWidth():
       width = self.main_window.maximumWidth()
 
-    ButtonFontSize = int(width/ 30)
-    class DisplayFontSizes:
-      ROUND_TIMER = int(width / 7)
-      BLINDS = int(width / 15)
-      NEXT_BLINDS = int(width / 25)
-      LEVEL = int(width / 30)
-      TOTAL_TIMER = int(width / 30)
-      BREAK_TIMER = int(width / 18)
-
-    self.mv_display.update_fonts(DisplayFontSizes.__dict__)
-    self.mv_controls.updateFonts(ButtonFontSize)
+    ButtonFontSize, DisplayFontSizes = main_window_font_sizes(width_bucket(width))
+    relayouts = self.mv_display.update_fonts(DisplayFontSizes)
+    relayouts += self.mv_controls.updateFonts(ButtonFontSize)
+    return relayouts
+
+  def watch_config(self, path: Path):
+    if self.config_watcher.files():
+      self.config_watcher.removePaths(self.config_watcher.files())
+    self.config_watcher.addPath(str(Path(path).resolve()))
+    if self.journal is not None:
+      self.journal.record_config(path)
+    if self.history is not None:
+      self.history.config_path = str(path)
+
+  def reload_config(self, path: str):
+    if Path(path).exists() and path not in self.config_watcher.files():
+      self.config_watcher.addPath(path) # editors that save by replacing the file drop it from the watcher
+    config = self.library.get(Path(path))
+    if not config:
+      print(f"Ignoring invalid edit of {path}: {self.library.errors().get(Path(path).resolve())}")
+      return
+    config.NEW = False # keep the current level and time left
+    for name, val in config.__dict__.items():
+      setattr(self.cfg, name, val)
+    self.current_state.update_config(self.cfg, update_counters=False)
+    self.reschedule_round_timer() # a changed period of the running level moved the deadline
+    if self._settings_window is not None:
+      self._settings_window.update()
+    print(f"Reloaded {self.cfg.NAME} from {path}")
+
+  def apply_config_edit(self):
+    # a level edited in the settings table, the clock keeps running
+    self.current_state.update_config(self.cfg, update_counters=False)
+    self.reschedule_round_timer()
+    self.update_mv_display_texts()
 
   def set_background_img(self, path:Path = Path("images/bg.jpg")):
-    self.main_window.setStyleSheet("#MainWindow { "
-                                                f" border-image: url({path.absolute()}) 0 0 0 0 stretch stretch;"
-                                                "}")
+    self.central_widget.set_image(path)
 
   def update_mv_display_texts(self):
-    if self.current_state.current_level >= len(self.cfg.BIG_BLIND_VALUES):
-      self.current_state.current_level = len(self.cfg.BIG_BLIND_VALUES)-1
-    self.mv_display.update_texts(self.sec_cnt)
+    self.mv_display.update_texts(self.current_state.clock.subsecond_ms())
 
   def showSettingsWindow(self):
     self.settings_window.show()
 
   # Timers
   def update_break_time(self):
-    if self.break_time == 0:
-      self.break_time = time.time()
-    new_time = time.time()
-    elapsed = round(new_time - self.break_time, 2)
+    elapsed = round(self.current_state.break_elapsed(), 2)
     time_pprint =  str(datetime.datetime.strftime(datetime.datetime.utcfromtimestamp(elapsed),'%M:%S'))
-    self.mv_display.labels["break_timer"].setText(f"BREAK {time_pprint}")
+    self.mv_display.set_label_text("break_timer", f"BREAK {time_pprint}")
 
   def update_total_time(self):
-    new_time = time.time()
-    elapsed = round(new_time - self.total_time, 2)
+    elapsed = round(self.current_state.total_elapsed(), 2)
     time_pprint =  str(datetime.datetime.strftime(datetime.datetime.utcfromtimestamp(elapsed),'%H:%M:%S'))
-    self.mv_display.labels["total_timer"].setText(f"{time_pprint}")
+    self.mv_display.set_label_text("total_timer", f"{time_pprint}")
 
   # method called by timer
   def update_stats_every_sec(self):
-    self.sec_cnt += self.time_step_ms
-    if self.sec_cnt >= 1000: # count to a second
-      self.sec_cnt = 0
-      self.current_state.counter_increment()
+    clock = self.current_state.clock
+    drift_ms = clock.mark_wakeup()
+    if drift_ms is not None:
+      METRICS.observe("timer_lateness_ms", "round_timer", max(0.0, drift_ms))
+    self.current_state.update_from_clock()
+    self.reschedule_round_timer()
+
+  def start_break_timer(self):
+    self.break_tick.reset() # the time since the last pause ended is not lateness
+    self.break_timer.start(1000)
+
+  def reschedule_round_timer(self):
+    if self.current_state.clock.is_running:
+      self.round_timer.start(self.current_state.clock.next_wakeup_ms())
+
+  def sync_timers(self):
+    # timers and the start/stop button after the state changed without the buttons (journal restore, LAN authority)
+    if self.current_state.is_running:
+      self.break_timer.stop()
+      self.mv_display.set_label_text("break_timer", "")
+      self.mv_controls.start_stop_set("start")
+      self.reschedule_round_timer()
+    else:
+      self.round_timer.stop()
+      if self.current_state.started:
+        self.mv_controls.start_stop_set("stop")
+      if self.current_state.pause_started is not None and not self.break_timer.isActive():
+        self.start_break_timer()
+
+  def on_engine_event(self, event: EngineEvent):
+    if event.kind == "finished":
+      self.sync_timers() # the clock stopped on its own, the button must not keep the running style
+
+  def apply_remote_state(self):
+    if self.remote_clock.poll(self.current_state):
+      self.sync_timers()
+      self.update_mv_display_texts()
+
+  def serve_local_commands(self):
+    for command in self.clock_publisher.commands():
+      if command["op"] == "field":
+        self.field_action(command.get("name"), command.get("count", 1))
+      else:
+        self.shared_actions[command["op"]]()
+    self.clock_publisher.publish() # config edits and field changes emit no engine event
 
   def start_stop_round_timer(self):
-    if self.round_timer.isActive():
+    if self.current_state.is_running:
+      self.current_state.pause()
       self.round_timer.stop()
-      self.break_time = 0
-      self.break_timer.start(1000)
+      self.start_break_timer()
       self.mv_controls.start_stop_set("stop")
     else:
-      self.round_timer.start(self.time_step_ms)
-      self.break_time = 0
-      self.break_timer.stop()
-      self.mv_controls.start_stop_set("start")
-    self.mv_display.labels["break_timer"].setText(f"")
+      self.current_state.start() # refused once the tournament finished
+      self.sync_timers()
+    self.mv_display.set_label_text("break_timer", "")
+
+  # Field
+  def field_action(self, name: str, count: int):
+    if self.clock_reader is not None:
+      self.clock_reader.send("field", name=name, count=count)
+      return
+    try:
+      self.field.apply(FieldDelta(**{name: count}))
+    except (TypeError, ValueError) as e: # TypeError: an unknown name from a display
+      print(f"Ignoring field change: {e}")
+      return
+    self.update_mv_display_texts()
+
+  def choose_registrations(self):
+    path = QFileDialog(self.main_window).getOpenFileName(filter="Registrations (*.csv *.txt)")[0]
+    if path:
+      self.import_registrations(Path(path))
+
+  def import_registrations(self, path: Path):
+    # parsed on the tracker's thread, the clock keeps ticking while a large batch is read
+    self.field_imports.append((path, self.field.import_batch(path)))
+    self.import_timer.start(IMPORT_POLL_MS)
+
+  def poll_imports(self):
+    pending = []
+    for path, future in self.field_imports:
+      if not future.done():
+        pending.append((path, future))
+        continue
+      try:
+        delta = future.result()
+        self.field.apply(delta)
+        print(f"Imported {path}: {delta}")
+      except (OSError, ValueError) as e:
+        print(f"Registration import of {path} failed: {e}")
+    self.field_imports = pending
+    if not pending:
+      self.import_timer.stop()
+    self.update_mv_display_texts()
 
   # Actions
   def next_level_button_action(self):
     self.current_state.nxt_level()
+    self.reschedule_round_timer()
     self.update_mv_display_texts()
 
   def prev_level_button_action(self):
     self.current_state.prev_level()
+    self.reschedule_round_timer()
     self.update_mv_display_texts()
 
   def reset_button_action(self):
     self.current_state.reset_level()
+    self.reschedule_round_timer()
     self.update_mv_display_texts()
 
 
@@ -187,15 +424,89 @@ class PokerTimer():
       self.mv_controls.setHidden(True)
 
 if __name__ == "__main__":
-  import sys
   app = QApplication(sys.argv)
   import argparse as argp
   parser = argp.ArgumentParser()
   parser.add_argument("-g", "--geometry", default="VGA", choices=WindowGeometry._member_map_)
   parser.add_argument("-c", "--config", default=None, type=Path, help="Path to a .json file with PokerConfig")
+  parser.add_argument("-n", "--name", default=None, help="NAME of a config in --config-dir, instead of --config")
+  parser.add_argument("--config-dir", default=Path("configs"), type=Path, help="Directory of the config library")
+  parser.add_argument("--eager", action="store_true", help="Build the settings window and load sounds before showing the clock")
+  parser.add_argument("-j", "--journal", default=None, type=Path, help="Journal file, the clock is restored from it after a crash")
+  parser.add_argument("--metrics-port", default=None, type=int, help="Serve timer lateness, callback and repaint histograms on http://127.0.0.1:PORT/metrics")
+  parser.add_argument("--metrics-csv", default=None, type=Path, help="Append the histogram summaries to this CSV file periodically")
+  parser.add_argument("--metrics-interval", default=60, type=float, help="Seconds between CSV dumps")
+  parser.add_argument("--profile", default=None, type=float, nargs="?", const=60, metavar="SECONDS",
+                      help="Profile the timer, button and settings slots for the first SECONDS (default 60), report on exit")
+  parser.add_argument("--profile-output", default=None, type=Path, help="Write the profile report here instead of stdout")
+  parser.add_argument("--renderer", default="labels", choices=("labels", "painted"),
+                      help="painted: draw the display in one widget from cached glyphs, cheaper at 4K")
+  parser.add_argument("--serve-lan", action="store_true", help="Be the authority LAN displays follow")
+  parser.add_argument("--follow", default=None, metavar="HOST", help="Display only, show the clock of the authority at HOST")
+  parser.add_argument("--serve-local", default=None, nargs="?", const="poker_timer", metavar="NAME",
+                      help="Own the clock and publish it in shared memory for --follow-local displays on this machine")
+  parser.add_argument("--follow-local", default=None, nargs="?", const="poker_timer", metavar="NAME",
+                      help="Display only, render the clock of the --serve-local process, controls act on it")
+  parser.add_argument("--terminal", action="store_true", help="Draw the clock in the terminal with curses, without Qt")
+  parser.add_argument("--history", default=Path("history"), type=Path, help="Directory of the tournament history store")
+  parser.add_argument("--no-history", action="store_true", help="Do not record this run")
+  parser.add_argument("--registrations", default=[], type=Path, nargs="+", metavar="FILE",
+                      help="Import registration batches (kind[,count] rows) into the field tracker")
+  parser.add_argument("--startup-report", action="store_true", help="Print per-phase startup timings")
+  parser.add_argument("--stats", action="store_true", help="Print wakeup drift, repaint, resize, paint and audio latency stats on quit")
   args = parser.parse_args()
   geometry = getattr(WindowGeometry, args.geometry)
+  library = ConfigLibrary(args.config_dir)
+  if args.profile is not None:
+    PROFILER.start(args.profile) # before the window is built, slots are wrapped as they are connected
+  if args.name is not None:
+    library.scan()
+    args.config = library.path_of(args.name)
+    if args.config is None:
+      raise ValueError(f"No config named {args.name} in {args.config_dir.absolute()}, known: {library.names()}")
 
   ptw = PokerTimer(geometry=geometry.value,
-                         config_path=args.config)
+                         config_path=args.config,
+                         lazy=not args.eager,
+                         library=library,
+                         journal_path=args.journal,
+                         renderer=args.renderer,
+                         serve_lan=args.serve_lan,
+                         follow=args.follow,
+                         history_dir=None if args.no_history else args.history,
+                         serve_local=args.serve_local,
+                         follow_local=args.follow_local)
+  for path in args.registrations:
+    ptw.import_registrations(path)
+  if args.startup_report:
+    def print_startup_report():
+      STARTUP.mark("event loop running")
+      print(STARTUP.report())
+    QTimer.singleShot(PREWARM_DELAY_MS + 1, print_startup_report) # after the settings window prewarm
+  if ptw.journal is not None:
+    app.aboutToQuit.connect(ptw.journal.close)
+  if ptw.history is not None:
+    app.aboutToQuit.connect(ptw.history.close)
+  if args.profile is not None:
+    def write_profile_report():
+      report = PROFILER.report()
+      if args.profile_output is None:
+        print(report)
+      else:
+        args.profile_output.write_text(report)
+    app.aboutToQuit.connect(write_profile_report)
+  if args.metrics_port is not None:
+    METRICS.serve(args.metrics_port)
+  if args.metrics_csv is not None:
+    METRICS.start_csv(args.metrics_csv, args.metrics_interval)
+    app.aboutToQuit.connect(lambda: METRICS.dump_csv(args.metrics_csv))
+  if args.stats:
+    def print_stats():
+      print(f"Round clock wakeup drift: {ptw.current_state.clock.drift_stats()}")
+      print(f"Label repaints: {ptw.mv_display.repaint_counts}")
+      print(f"Main window resizes: {ptw.resize_coalescer.stats()}")
+      print(f"Background paints: {ptw.central_widget.paint_stats()}")
+      if ptw.current_state.audio is not None:
+        print(f"Audio cue latency: {ptw.current_state.audio.latency_stats()}")
+    app.aboutToQuit.connect(print_stats)
   sys.exit(app.exec_())
@@ -0,0 +1,114 @@
+import cProfile
+import functools
+import inspect
+import io
+import pstats
+import time
+import tracemalloc
+
+PROFILE_WINDOW_S = 60
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 10
+TRACEMALLOC_FRAMES = 5
+
+
+def accepted_positional(fn) -> int | None:
+  # how many positional arguments fn takes, None if any number.
+  # Qt hands signal arguments (e.g. clicked's checked flag) to slots that may not take them
+  try:
+    params = inspect.signature(fn).parameters.values()
+  except (TypeError, ValueError):
+    return None
+  if any(p.kind == p.VAR_POSITIONAL for p in params):
+    return None
+  return sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in params)
+
+
+class SlotStats:
+  __slots__ = ("calls", "total_s", "net_bytes", "peak_bytes")
+
+  def __init__(self):
+    self.calls = 0
+    self.total_s = 0.0
+    self.net_bytes = 0 # memory still allocated after the slot returned
+    self.peak_bytes = 0 # largest rise of traced memory during one call
+
+
+class SlotProfiler:
+  # cProfile and tracemalloc around every wrapped slot for the first window_s seconds,
+  # time spent in the event loop between slots is not profiled
+  def __init__(self):
+    self.enabled = False
+    self.until = 0.0
+    self.profile = cProfile.Profile()
+    self.slots: dict[str, SlotStats] = {}
+    self.depth = 0
+    self.snapshot = None
+    self.window_s = 0.0
+
+  def start(self, window_s: float = PROFILE_WINDOW_S):
+    self.enabled = True
+    self.window_s = window_s
+    self.until = time.perf_counter() + window_s
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+
+  def finish(self):
+    if self.enabled:
+      self.enabled = False
+      self.snapshot = tracemalloc.take_snapshot()
+      tracemalloc.stop()
+
+  def wrap(self, label: str, fn):
+    if not self.enabled:
+      return fn
+    stats = self.slots.setdefault(label, SlotStats())
+    nargs = accepted_positional(fn)
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+      if nargs is not None:
+        args = args[:nargs]
+      if not self.enabled or time.perf_counter() > self.until:
+        self.finish()
+        return fn(*args, **kwargs)
+      outermost = self.depth == 0
+      if outermost:
+        tracemalloc.reset_peak()
+      before, _ = tracemalloc.get_traced_memory()
+      self.depth += 1
+      start = time.perf_counter()
+      if outermost:
+        self.profile.enable()
+      try:
+        return fn(*args, **kwargs)
+      finally:
+        if outermost:
+          self.profile.disable()
+        self.depth -= 1
+        after, peak = tracemalloc.get_traced_memory()
+        stats.calls += 1
+        stats.total_s += time.perf_counter() - start
+        stats.net_bytes += after - before
+        if outermost:
+          stats.peak_bytes = max(stats.peak_bytes, peak - before)
+    return wrapper
+
+  def report(self) -> str:
+    self.finish()
+    out = io.StringIO()
+    out.write(f"Slots profiled during the first {self.window_s:g} s:\n")
+    out.write(f"{'slot':<28}{'calls':>8}{'total ms':>11}{'mean ms':>10}{'net KiB':>10}{'peak KiB':>10}\n")
+    for label, stats in sorted(self.slots.items(), key=lambda item: -item[1].total_s):
+      mean_ms = 1000 * stats.total_s / stats.calls if stats.calls else 0.0
+      out.write(f"{label:<28}{stats.calls:>8}{stats.total_s * 1000:>11.1f}{mean_ms:>10.3f}"
+                f"{stats.net_bytes / 1024:>10.1f}{stats.peak_bytes / 1024:>10.1f}\n")
+    out.write("\n")
+    if self.profile.getstats():
+      pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    if self.snapshot is not None:
+      out.write(f"Top {TOP_ALLOCATIONS} allocation sites still alive at the end of the window:\n")
+      for stat in self.snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+        out.write(f"  {stat}\n")
+    return out.getvalue()
+
+
+PROFILER = SlotProfiler()
@@ -0,0 +1,153 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import NamedTuple
+
+
+class Level(NamedTuple):
+  level: int # blind level number, for a break the level played before it
+  small_blind: int
+  big_blind: int
+  ante: int
+  duration_s: int
+  is_break: bool = False
+
+
+class ScheduleError(ValueError):
+  def __init__(self, name: str, errors: list[str]):
+    super().__init__(f"{name}: " + "; ".join(errors))
+    self.errors = errors
+
+
+class LevelSchedule:
+  # Immutable list of levels and breaks with cumulative start offsets,
+  # the entry running at any elapsed time is a bisect away
+  __slots__ = ("name", "entries", "starts", "total_s", "next_playable", "playable_levels", "playable_positions",
+               "break_positions")
+
+  def __init__(self, name: str, entries: list[Level]):
+    self.name = name
+    self.entries = tuple(entries)
+    self.starts = tuple(accumulate((entry.duration_s for entry in self.entries), initial=0))[:-1]
+    self.total_s = self.starts[-1] + self.entries[-1].duration_s if self.entries else 0
+    # the lookups the display does every refresh, precomputed so they do not scan long structures
+    self.playable_positions = tuple(position for position, entry in enumerate(self.entries) if not entry.is_break)
+    self.playable_levels = tuple(self.entries[position].level for position in self.playable_positions)
+    self.break_positions = {entry.level: position for position, entry in enumerate(self.entries) if entry.is_break}
+    following, nxt = [], None # position of the first level after each position
+    for position in range(len(self.entries)-1, -1, -1):
+      following.append(nxt)
+      if not self.entries[position].is_break:
+        nxt = position
+    self.next_playable = tuple(reversed(following))
+
+  def __len__(self) -> int:
+    return len(self.entries)
+
+  def __getitem__(self, position: int) -> Level:
+    return self.entries[position]
+
+  def __deepcopy__(self, memo):
+    return self # immutable, configs copied by the library share it
+
+  def locate(self, elapsed_s: float) -> tuple[int, float]:
+    # (position, seconds left in it), past the end stays on the last entry with 0 left
+    if elapsed_s >= self.total_s:
+      return len(self.entries)-1, 0.0
+    position = max(0, bisect_right(self.starts, elapsed_s) - 1)
+    return position, self.starts[position] + self.entries[position].duration_s - elapsed_s
+
+  def end_of(self, position: int) -> int:
+    return self.starts[position] + self.entries[position].duration_s
+
+  def position_of_level(self, level: int) -> int:
+    index = bisect_left(self.playable_levels, level)
+    return self.playable_positions[index] if index < len(self.playable_positions) else len(self.entries)-1
+
+  def position_of_entry(self, entry: Level) -> int:
+    # where an entry of another compilation of the structure is in this one: a break by the level before it,
+    # a break that is gone by the level after it
+    if entry.is_break:
+      position = self.break_positions.get(entry.level)
+      return self.position_of_level(entry.level + 1) if position is None else position
+    return self.position_of_level(entry.level)
+
+  def next_level(self, position: int) -> Level | None:
+    nxt = self.next_playable[position]
+    return None if nxt is None else self.entries[nxt]
+
+
+def period_s(period, errors: list[str], what: str) -> int:
+  # [m, s] lists from json or MyTime objects
+  try:
+    m, s = (period.m, period.s) if hasattr(period, "m") else period
+  except (TypeError, ValueError):
+    m = s = None
+  if any(not isinstance(val, int) or isinstance(val, bool) for val in (m, s)): # "20" would be written back as is
+    errors.append(f"{what} must be [minutes, seconds] integers, got {period!r}")
+    return 0
+  seconds = m * 60 + s
+  if seconds <= 0:
+    errors.append(f"{what} must be positive, got {period!r}")
+  return seconds
+
+
+def compile_schedule(config) -> LevelSchedule:
+  # Every problem of the config is collected and raised together as a ScheduleError
+  errors = []
+  blinds = config.BIG_BLIND_VALUES
+  increment = config.CHIP_INCREMENT
+  if not isinstance(increment, int) or increment <= 0:
+    errors.append(f"CHIP_INCREMENT must be a positive integer, got {increment!r}")
+    increment = None
+  if not isinstance(blinds, list) or not blinds:
+    errors.append(f"BIG_BLIND_VALUES must be a non-empty list, got {blinds!r}")
+    blinds = []
+
+  for name in ("REBUY_CHIPS", "ADDON_CHIPS"):
+    chips = getattr(config, name)
+    if chips is not None and (not isinstance(chips, int) or chips <= 0):
+      errors.append(f"{name} must be a positive integer, got {chips!r}")
+
+  antes = config.ANTE_VALUES if config.ANTE_VALUES is not None else [0] * len(blinds)
+  if not isinstance(antes, list) or len(antes) != len(blinds):
+    errors.append(f"ANTE_VALUES must have one value per level ({len(blinds)})")
+    antes = [0] * len(blinds)
+  if config.LEVEL_PERIODS is not None:
+    if not isinstance(config.LEVEL_PERIODS, list) or len(config.LEVEL_PERIODS) != len(blinds):
+      errors.append(f"LEVEL_PERIODS must have one period per level ({len(blinds)})")
+      durations = [0] * len(blinds)
+    else:
+      durations = [period_s(p, errors, f"LEVEL_PERIODS[{i}]") for i, p in enumerate(config.LEVEL_PERIODS)]
+  else:
+    durations = [period_s(config.LEVEL_PERIOD, errors, "LEVEL_PERIOD")] * len(blinds)
+
+  breaks = {}
+  for item in config.BREAKS or []:
+    try:
+      after_level, period = item
+    except (TypeError, ValueError):
+      errors.append(f"BREAKS entries must be [after_level, [minutes, seconds]], got {item!r}")
+      continue
+    if not isinstance(after_level, int) or not 1 <= after_level < len(blinds):
+      errors.append(f"Break after level {after_level!r} is not between two levels")
+      continue
+    breaks[after_level] = period_s(period, errors, f"Break after level {after_level}")
+
+  entries = []
+  for i, (bb, ante, duration) in enumerate(zip(blinds, antes, durations)):
+    level = i + 1
+    if not isinstance(bb, int) or bb <= 0:
+      errors.append(f"Level {level}: big blind must be a positive integer, got {bb!r}")
+      continue
+    sb = int(bb / 2)
+    if increment and (sb == 0 or sb % increment != 0):
+      errors.append(f"Level {level}: small blind {sb} is not a multiple of chip increment {increment}")
+    if not isinstance(ante, int) or ante < 0 or (increment and ante % increment != 0):
+      errors.append(f"Level {level}: ante {ante!r} is not a non-negative multiple of chip increment {increment}")
+    entries.append(Level(level, sb, bb, ante, duration))
+    if level in breaks:
+      entries.append(Level(level, 0, 0, 0, breaks[level], is_break=True))
+
+  if errors:
+    raise ScheduleError(config.NAME, errors)
+  return LevelSchedule(config.NAME, entries)
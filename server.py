@@ -0,0 +1,166 @@
+import asyncio
+import heapq
+import json
+import time
+from pathlib import Path
+
+from clock import DeadlineClock
+from config import PokerConfig, load_config_from_json
+from engine import TournamentEngine
+
+
+class TournamentHost:
+  # Many TournamentEngines on one asyncio loop. Only level deadlines are kept in a heap
+  # and a single loop timer is armed for the earliest one, so an idle host does not wake up.
+  def __init__(self, loop: asyncio.AbstractEventLoop | None = None):
+    self.loop = asyncio.get_event_loop() if loop is None else loop
+    self.engines: dict[str, TournamentEngine] = {}
+    self.configs: dict[Path, PokerConfig] = {} # shared between tournaments using the same file
+    self.heap = [] # (deadline, generation, tournament id), stale entries are skipped on pop
+    self.generations: dict[str, int] = {}
+    self.timer_handle = None
+    self.timer_deadline = None
+    self.wakeups = 0
+
+  def load_config(self, path: Path) -> PokerConfig:
+    path = Path(path).resolve()
+    if path not in self.configs:
+      config = load_config_from_json(path)
+      if not config:
+        raise ValueError(f"Config file {path} does not exist!")
+      config.NEW = False # engines reset on creation, NEW would make the first reader reset the others
+      self.configs[path] = config
+    return self.configs[path]
+
+  # API
+  def create(self, tid: str, config_path: Path, start: bool = False) -> dict:
+    if tid in self.engines:
+      raise ValueError(f"Tournament {tid} already exists!")
+    self.engines[tid] = TournamentEngine(self.load_config(config_path), DeadlineClock(self.loop.time))
+    self.generations[tid] = 0
+    if start:
+      self.resume(tid)
+    return self.state(tid)
+
+  def remove(self, tid: str) -> dict:
+    self.get(tid)
+    del self.engines[tid]
+    del self.generations[tid] # heap entries die as stale
+    return {"id": tid, "removed": True}
+
+  def pause(self, tid: str) -> dict:
+    self.get(tid).pause()
+    self.schedule(tid)
+    return self.state(tid)
+
+  def resume(self, tid: str) -> dict:
+    self.get(tid).start()
+    self.schedule(tid)
+    return self.state(tid)
+
+  def jump_level(self, tid: str, level: int) -> dict:
+    self.get(tid).jump_level(int(level))
+    self.schedule(tid)
+    return self.state(tid)
+
+  def state(self, tid: str) -> dict:
+    engine = self.get(tid)
+    level, _, _, bb, sb, nbb, nsb = engine.get_state()
+    minute, second = divmod(engine.clock.remaining_seconds(), 60)
+    return {"id": tid,
+            "name": engine.config.NAME,
+            "level": level,
+            "remaining": round(engine.clock.remaining(), 3),
+            "display": f"{minute}:{second:02d}",
+            "running": engine.is_running,
+            "blinds": [sb, bb],
+            "next_blinds": [nsb, nbb]}
+
+  def get(self, tid: str) -> TournamentEngine:
+    if tid not in self.engines:
+      raise KeyError(f"No tournament {tid}")
+    return self.engines[tid]
+
+  # Deadline scheduling
+  def schedule(self, tid: str):
+    self.generations[tid] += 1
+    engine = self.engines[tid]
+    if not engine.is_running:
+      return
+    deadline = engine.clock.deadline
+    heapq.heappush(self.heap, (deadline, self.generations[tid], tid))
+    if self.timer_deadline is None or deadline < self.timer_deadline:
+      self.arm(deadline)
+
+  def arm(self, deadline: float):
+    if self.timer_handle is not None:
+      self.timer_handle.cancel()
+    self.timer_deadline = deadline
+    self.timer_handle = self.loop.call_at(deadline, self.on_deadline)
+
+  def on_deadline(self):
+    self.timer_handle = None
+    self.timer_deadline = None
+    self.wakeups += 1
+    now = self.loop.time()
+    while self.heap and self.heap[0][0] <= now + DeadlineClock.EARLY_TOLERANCE_S:
+      _, generation, tid = heapq.heappop(self.heap)
+      if self.generations.get(tid) != generation:
+        continue
+      self.engines[tid].update_from_clock()
+      self.schedule(tid)
+    while self.heap and self.generations.get(self.heap[0][2]) != self.heap[0][1]:
+      heapq.heappop(self.heap)
+    if self.heap:
+      self.arm(self.heap[0][0])
+
+  # JSON lines protocol: {"op": "create", "id": "t1", "config": "configs/t1000.json"}
+  def handle(self, request: dict) -> dict:
+    ops = {"create": lambda r: self.create(r["id"], r["config"], r.get("start", False)),
+           "remove": lambda r: self.remove(r["id"]),
+           "pause": lambda r: self.pause(r["id"]),
+           "resume": lambda r: self.resume(r["id"]),
+           "jump": lambda r: self.jump_level(r["id"], r["level"]),
+           "state": lambda r: self.state(r["id"]),
+           "list": lambda r: {"ids": list(self.engines)}}
+    try:
+      return {"ok": True, **ops[request["op"]](request)}
+    except (KeyError, ValueError, TypeError) as e:
+      return {"ok": False, "error": repr(e)}
+
+  async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    while line := await reader.readline():
+      try:
+        response = self.handle(json.loads(line))
+      except json.JSONDecodeError as e:
+        response = {"ok": False, "error": repr(e)}
+      writer.write(json.dumps(response).encode() + b"\n")
+      await writer.drain()
+    writer.close()
+
+
+async def main(args):
+  host = TournamentHost(asyncio.get_running_loop())
+  for i in range(args.bench):
+    host.create(f"bench{i}", args.bench_config, start=True)
+  server = await asyncio.start_server(host.serve_client, args.host, args.port)
+  print(f"Serving {len(host.engines)} tournaments on {args.host}:{args.port}")
+  async with server:
+    if args.bench:
+      cpu, wall = time.process_time(), time.perf_counter()
+      await asyncio.sleep(args.bench_seconds)
+      cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+      print(f"{args.bench} clocks idle for {wall:.1f} s: {100 * cpu / wall:.3f}% CPU, {host.wakeups} wakeups")
+      return
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+  import argparse as argp
+  parser = argp.ArgumentParser(description="Host many tournament clocks in one process")
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("-p", "--port", default=8765, type=int)
+  parser.add_argument("--bench", default=0, type=int, help="Start BENCH tournaments, measure idle CPU and exit")
+  parser.add_argument("--bench-config", default=Path("configs/t1000.json"), type=Path)
+  parser.add_argument("--bench-seconds", default=10.0, type=float)
+  asyncio.run(main(parser.parse_args()))
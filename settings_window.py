@@ -1,24 +1,158 @@
+import copy
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pyqtgraph as pg
-from PyQt5.QtCore import QTimer
-from PyQt5.QtWidgets import (QFileDialog, QGridLayout, QHBoxLayout, QLineEdit,
-                             QVBoxLayout, QWidget, QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
+from PyQt5.QtGui import QFontMetrics
+from PyQt5.QtWidgets import (QAbstractItemView, QCheckBox, QCompleter, QFileDialog, QGridLayout, QHBoxLayout, QLabel, QLineEdit,
+                             QSpinBox, QVBoxLayout, QWidget, QTableView, QHeaderView)
 
+from config_library import ConfigLibrary
+from engine import TournamentEngine
+from schedule import Level, LevelSchedule, ScheduleError, compile_schedule
 from utils import *
 
 
+NOW_INTERVAL_MS = 1000
+MARKER_MAX_LEVELS = 60 # level markers only while they do not pile up
+BREAK_BRUSH = (90, 90, 255, 60)
+SPAN = 1e9 # break shading height, any y range and log mode; left out of the auto range
+
+
+def timeline(schedule: LevelSchedule) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+  # step curve of the big blind against clock hours (two points per entry, a break keeps the blinds
+  # of the level before it) and which entries are breaks
+  entries = schedule.entries
+  starts = np.array(schedule.starts, dtype=float) / 3600
+  ends = starts + np.array([entry.duration_s for entry in entries]) / 3600
+  is_break = np.array([entry.is_break for entry in entries], dtype=bool)
+  played = np.maximum.accumulate(np.where(is_break, 0, np.arange(len(entries))))
+  bb = np.array([entry.big_blind for entry in entries], dtype=float)[played]
+  return np.column_stack([starts, ends]).ravel(), np.repeat(bb, 2), is_break
+
+
+class LevelTableModel(QAbstractTableModel):
+  # Rows are the compiled schedule entries (levels and breaks). A new schedule is diffed
+  # against the shown one, so a reload or an edit only signals the rows that changed.
+  # Edits go through the config, are validated by compiling it and rejected on errors.
+  COLUMNS = ("BIG BLIND", "ANTE", "PERIOD")
+  config_edited = pyqtSignal()
+
+  def __init__(self, config: PokerConfig, parent=None):
+    super().__init__(parent)
+    self.cfg = config
+    self.entries: tuple[Level, ...] = config.compiled().entries
+
+  def rowCount(self, parent=QModelIndex()) -> int:
+    return 0 if parent.isValid() else len(self.entries)
+
+  def columnCount(self, parent=QModelIndex()) -> int:
+    return 0 if parent.isValid() else len(self.COLUMNS)
+
+  def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+    if role != QtCore.Qt.DisplayRole:
+      return None
+    if orientation == QtCore.Qt.Horizontal:
+      return self.COLUMNS[section]
+    entry = self.entries[section]
+    return "" if entry.is_break else str(entry.level)
+
+  def data(self, index, role=QtCore.Qt.DisplayRole):
+    if role == QtCore.Qt.TextAlignmentRole:
+      return QtCore.Qt.AlignCenter
+    if role not in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+      return None
+    entry = self.entries[index.row()]
+    column = index.column()
+    if column == 2:
+      return f"{entry.duration_s // 60}:{entry.duration_s % 60:02d}"
+    if entry.is_break:
+      return "BREAK" if column == 0 and role == QtCore.Qt.DisplayRole else ""
+    return str(entry.big_blind if column == 0 else entry.ante)
+
+  def flags(self, index):
+    flags = super().flags(index)
+    if index.column() == 2 or not self.entries[index.row()].is_break:
+      flags |= QtCore.Qt.ItemIsEditable
+    return flags
+
+  def setData(self, index, value, role=QtCore.Qt.EditRole) -> bool:
+    if role != QtCore.Qt.EditRole or not index.isValid():
+      return False
+    entry = self.entries[index.row()]
+    edited = copy.copy(self.cfg)
+    edited.schedule = None
+    try:
+      if index.column() == 2:
+        time = MyTime.fromstr(str(value).strip())
+        period = [time.m, time.s]
+        if entry.is_break:
+          edited.BREAKS = [[after, period if after == entry.level else p] for after, p in self.cfg.BREAKS]
+        else:
+          periods = self.cfg.LEVEL_PERIODS or [[self.cfg.LEVEL_PERIOD.m, self.cfg.LEVEL_PERIOD.s]] * len(self.cfg.BIG_BLIND_VALUES)
+          edited.LEVEL_PERIODS = list(periods)
+          edited.LEVEL_PERIODS[entry.level-1] = period
+      elif index.column() == 0:
+        edited.BIG_BLIND_VALUES = list(self.cfg.BIG_BLIND_VALUES)
+        edited.BIG_BLIND_VALUES[entry.level-1] = int(value)
+      else:
+        edited.ANTE_VALUES = list(self.cfg.ANTE_VALUES or [0] * len(self.cfg.BIG_BLIND_VALUES))
+        edited.ANTE_VALUES[entry.level-1] = int(value)
+      schedule = compile_schedule(edited)
+    except (ValueError, ScheduleError) as e: # int() of a typo or a structure the timer would reject
+      print(f"Rejected edit of level {entry.level}: {e}")
+      return False
+    for name in ("BIG_BLIND_VALUES", "ANTE_VALUES", "LEVEL_PERIODS", "BREAKS"):
+      setattr(self.cfg, name, getattr(edited, name))
+    self.cfg.schedule = schedule
+    self.set_schedule(schedule)
+    self.config_edited.emit()
+    return True
+
+  def set_schedule(self, schedule: LevelSchedule):
+    old, new = self.entries, schedule.entries
+    common = min(len(old), len(new))
+    if len(new) < len(old):
+      self.beginRemoveRows(QModelIndex(), common, len(old)-1)
+      self.entries = old[:common]
+      self.endRemoveRows()
+    elif len(new) > len(old):
+      self.beginInsertRows(QModelIndex(), common, len(new)-1)
+      self.entries = old + new[common:]
+      self.endInsertRows()
+    self.entries = new
+    # contiguous runs of changed rows, one signal each
+    first = None
+    for row in range(common + 1):
+      changed = row < common and old[row] != new[row]
+      if changed and first is None:
+        first = row
+      elif not changed and first is not None:
+        self.dataChanged.emit(self.index(first, 0), self.index(row-1, len(self.COLUMNS)-1))
+        self.headerDataChanged.emit(QtCore.Qt.Vertical, first, row-1)
+        first = None
+
+
 class SettingsWindow(QWidget):
-  def __init__(self, config: PokerConfig, bg_color: str = "rgb(120,120,120)"):
+  config_loaded = pyqtSignal(object) # path of the file the config came from
+
+  def __init__(self, config: PokerConfig, bg_color: str = "rgb(120,120,120)",
+               library: ConfigLibrary | None = None, engine: TournamentEngine | None = None):
     super().__init__()
     self.resize(WindowGeometry.SETTINGS.value)
     self.setStyleSheet(f" background-color: {bg_color};")
     self.cfg = config
+    if library is None:
+      library = ConfigLibrary()
+      library.scan()
+    self.library = library
+    self.engine = engine # the running tournament, for the "now" cursor
+    self.update = PROFILER.wrap("SettingsWindow.update", self.update)
     if self.cfg.BIG_BLIND_VALUES == [] or self.cfg.BIG_BLIND_VALUES == -1: # if uninitialized
       raise ValueError("BIG_BLIND_VALUES are empty! calculating values from plots, dummy values")
 
-    self.x = range(len(self.cfg.BIG_BLIND_VALUES))
-
     self.sizePolicy_Std = get_std_size_policy(self)
     grand_layout = QHBoxLayout(self)
     self.setLayout(grand_layout)
@@ -27,37 +161,68 @@ class SettingsWindow(QWidget):
     self.buttons = {}
     self.buttons["load_config"] = MyPushButton("config_load", text="Load Config", whats_this="Loads Config from file")
 
-    # Config
-    val = self.cfg.BIG_BLIND_VALUES
-    tablewidget= QTableWidget()
+    # Name lookup in the config library
+    self.config_name = QLineEdit()
+    self.config_name.setPlaceholderText("Config name, e.g. T10000-LONG")
+    self.config_name.setStyleSheet("color: black; background-color: white")
+    completer = QCompleter(self.library.names(), self.config_name)
+    completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+    self.config_name.setCompleter(completer)
+
+    # Tournament length simulation, runs off the GUI thread and is polled by sim_timer
+    self.buttons["simulate"] = MyPushButton("simulate", text="Simulate", whats_this="Estimates how long the structure runs for the number of players")
+    self.sim_players = QSpinBox()
+    self.sim_players.setRange(2, 10000)
+    self.sim_players.setValue(9)
+    self.sim_players.setSuffix(" players")
+    self.sim_players.setStyleSheet("color: black; background-color: white")
+    self.sim_result = QLabel("")
+    self.sim_result.setStyleSheet("color: black")
+    self.sim_executor = ThreadPoolExecutor(max_workers=1)
+    self.sim_future: Future | None = None
+    self.sim_timer = QTimer(self)
+    self.sim_timer.timeout.connect(self.poll_simulation)
+
+    # Config, a view over the schedule: only visible rows are painted, fixed row heights need no measuring
+    self.table_model = LevelTableModel(self.cfg, self)
+    tablewidget = QTableView()
+    tablewidget.setModel(self.table_model)
     tablewidget.setSizePolicy(get_std_size_policy(tablewidget))
-    tablewidget.setColumnCount(2)
-    tablewidget.setRowCount(len(val))
     tablewidget.setAutoFillBackground(True)
     tablewidget.setAlternatingRowColors(True)
-    tablewidget.setHorizontalHeaderItem(0, QTableWidgetItem("BIG BLIND"))
-    tablewidget.setHorizontalHeaderItem(1, QTableWidgetItem("PERIOD"))
     tablewidget.setStyleSheet("text-align: center; color: black")
-    for id, x in enumerate(val):
-      tablewidget.setItem(id, 0,  QTableWidgetItem(str(self.cfg.BIG_BLIND_VALUES[id])))
-      tablewidget.setItem(id, 1,  QTableWidgetItem(f"{self.cfg.LEVEL_PERIOD.m}:{self.cfg.LEVEL_PERIOD.s}"))
-
+    tablewidget.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed)
+    tablewidget.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
     tablewidget.horizontalHeader().setStretchLastSection(True)
     tablewidget.horizontalHeader().setSectionResizeMode(
         QHeaderView.Stretch)
     self.tablewidget = tablewidget
+    self.config_edited = self.table_model.config_edited
 
 
-    # Graph
+    # Graph: blinds against clock time. Built once, a config change replaces the data of the items
+    # and the "now" cursor is moved by itself, the curve is never re-plotted for it
     self.graphWidget = pg.PlotWidget(self)
     self.graphWidget.setSizePolicy(self.sizePolicy_Std)
 
-    pen = pg.mkPen(width=10, style=QtCore.Qt.DashDotDotLine)
-    self.data_line_y = self.graphWidget.plot(self.x, self.cfg.BIG_BLIND_VALUES, name="X", pen=pen, symbol="o", symbolSize=30, symbolBrush=('r'))
+    self.graphWidget.addLegend()
+    self.breaks = pg.BarGraphItem(x0=[], x1=[], y0=-SPAN, height=2 * SPAN, brush=BREAK_BRUSH, pen=None)
+    self.graphWidget.addItem(self.breaks, ignoreBounds=True)
+    self.data_line_y = self.graphWidget.plot(name="BigBlind", pen=pg.mkPen(width=3))
+    self.data_line_y.setDownsampling(auto=True, method="peak") # thousands of levels: a few points per pixel
+    self.data_line_y.setClipToView(True)
+    self.level_markers = self.graphWidget.plot(pen=None, symbol="o", symbolSize=12, symbolBrush="r")
+    self.now_cursor = pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen("r", width=2))
+    self.now_cursor.setVisible(False)
+    self.graphWidget.addItem(self.now_cursor, ignoreBounds=True)
+    self.now_timer = QTimer(self)
+    self.now_timer.timeout.connect(self.update_now_cursor)
     styles = {'color':'r', 'font-size':'20px'}
     self.graphWidget.setLabel('left', 'BigBlind', **styles)
-    self.graphWidget.setLabel('bottom', 'Level', **styles)
-    self.graphWidget.addLegend()
+    self.graphWidget.setLabel('bottom', 'Clock time (h)', **styles)
+    self.log_scale = QCheckBox("Log scale")
+    self.log_scale.setStyleSheet("color: black")
+    self.log_scale.toggled.connect(lambda checked: self.graphWidget.setLogMode(y=checked))
     self.graphWidget.setMouseEnabled(False,False)
     self.graphWidget.showGrid(x=True, y=True)
     self.graphWidget.setBackground('w')
@@ -65,9 +230,19 @@ class SettingsWindow(QWidget):
 
     VLay = QVBoxLayout()
     VLay.addWidget(self.tablewidget)
+    VLay.addWidget(self.config_name)
     VLay.addWidget(self.buttons["load_config"])
+    SimLay = QHBoxLayout()
+    SimLay.addWidget(self.sim_players)
+    SimLay.addWidget(self.buttons["simulate"])
+    VLay.addLayout(SimLay)
+    VLay.addWidget(self.sim_result)
+
+    GraphLay = QVBoxLayout()
+    GraphLay.addWidget(self.graphWidget)
+    GraphLay.addWidget(self.log_scale)
 
-    self.grand_lay_objs = [self.graphWidget,
+    self.grand_lay_objs = [GraphLay,
                            VLay]
 
     for x in self.grand_lay_objs:
@@ -77,53 +252,121 @@ class SettingsWindow(QWidget):
         grand_layout.addWidget(x)
 
     # Events + Actions
+    self.resize_coalescer = ResizeCoalescer(self, self.apply_resize)
     self.resizeEvent = self.customResizeEvent
     self.buttons["load_config"].clicked.connect(self.load_config_from_a_file)
+    self.config_name.returnPressed.connect(self.load_config_by_name)
+    self.config_edited.connect(self.update)
+    self.buttons["simulate"].clicked.connect(self.run_simulation)
+    self.plot_timeline(self.cfg.compiled())
+
+  def run_simulation(self):
+    if self.sim_future is not None and not self.sim_future.done():
+      return
+    import simulator # numpy, only when asked for
+    self.sim_result.setText(f"Simulating {self.cfg.NAME}...")
+    self.sim_future = self.sim_executor.submit(simulator.simulate, self.cfg, self.sim_players.value())
+    self.sim_timer.start(200)
+
+  def poll_simulation(self):
+    if not self.sim_future.done():
+      return
+    self.sim_timer.stop()
+    import simulator
+    try:
+      self.sim_result.setText(simulator.format_report(self.sim_future.result()))
+    except Exception as e:
+      self.sim_result.setText(f"Simulation failed: {e!r}")
 
   def load_config_from_a_file(self):
-    json_path = Path(QFileDialog(self, directory="configs").getOpenFileName(filter="File (*.json)")[0])
-    config = load_config_from_json(json_path)
+    json_path = Path(QFileDialog(self, directory=str(self.library.directory)).getOpenFileName(filter="File (*.json)")[0])
+    config = self.library.get(json_path)
     if config:
       print(f"Valid config found at {json_path}!")
-      for name, val in config.__dict__.items():
-        setattr(self.cfg, name, val)
-      print(self.cfg)
-      self.update()
+      self.apply_config(config, json_path)
+
+  def load_config_by_name(self):
+    name = self.config_name.text().strip()
+    config = self.library.find(name)
+    if config:
+      self.apply_config(config, self.library.path_of(name))
+    else:
+      print(f"No config named {name} in {self.library.directory}")
+
+  def apply_config(self, config: PokerConfig, path: Path):
+    config.NEW = True # the game state resets to level 1 on its next refresh
+    for name, val in config.__dict__.items():
+      setattr(self.cfg, name, val)
+    print(self.cfg)
+    self.update()
+    self.config_loaded.emit(path)
 
   def customResizeEvent(self, event) -> None:
+    self.resize_coalescer.request()
+
+  def apply_resize(self) -> int:
     width = self.width()
     height = self.height()
     if width >= self.maximumWidth():
       width = self.maximumWidth()
-    ButtonLCFontSize = int(width / 60)
-    font = self.buttons["load_config"].font()
-    font.setPointSize(ButtonLCFontSize)
-    self.buttons["load_config"].setFont(font)
-
     from math import floor
     w = floor(width*0.45)
     self.graphWidget.setMinimumWidth(w)
     self.tablewidget.setMinimumHeight(int(height*0.6))
-    font = self.tablewidget.font()
-    ButtonLCFontSize = int(width / 80)
-    font.setPointSize(ButtonLCFontSize)
-    self.tablewidget.setFont(font)
-    self.tablewidget.resizeRowsToContents()
-    self.tablewidget.resizeColumnsToContents()
-    self.tablewidget.horizontalHeader().setFont(font)
-    self.tablewidget.verticalHeader().setFont(font)
-    self.tablewidget.horizontalHeaderItem(0).setFont(font)
-    self.tablewidget.horizontalHeaderItem(1).setFont(font)
 
+    width = width_bucket(width)
+    changed = 0
+    ButtonLCFontSize = int(width / 60)
+    if self.buttons["load_config"].font().pointSize() != ButtonLCFontSize:
+      self.buttons["load_config"].setFont(sized_font(self.buttons["load_config"].font(), ButtonLCFontSize))
+      changed += 1
+
+    TableFontSize = int(width / 80)
+    if self.tablewidget.font().pointSize() != TableFontSize:
+      font = sized_font(self.tablewidget.font(), TableFontSize)
+      self.tablewidget.setFont(font)
+      self.tablewidget.horizontalHeader().setFont(font)
+      self.tablewidget.verticalHeader().setFont(font)
+      self.tablewidget.verticalHeader().setDefaultSectionSize(QFontMetrics(font).height() + 8)
+      changed += 1
+    return changed
 
   def update(self):
-    self.x = range(len(self.cfg.BIG_BLIND_VALUES))
-    self.data_line_y.setData(self.x, self.cfg.BIG_BLIND_VALUES)
-
-    for x in range(self.tablewidget.rowCount()):
-      self.tablewidget.removeRow(x)
-    self.tablewidget.setRowCount(len(self.cfg.BIG_BLIND_VALUES))
-    for id, x in enumerate(self.cfg.BIG_BLIND_VALUES):
-      self.tablewidget.setItem(id, 0,  QTableWidgetItem(str(x)))
-      self.tablewidget.setItem(id, 1,  QTableWidgetItem(f"{self.cfg.LEVEL_PERIOD.m}:{self.cfg.LEVEL_PERIOD.s}"))
+    schedule = self.cfg.compiled()
+    if schedule is not self.plotted:
+      self.plot_timeline(schedule)
+    self.table_model.set_schedule(schedule)
+
+  # Timeline
+  def plot_timeline(self, schedule: LevelSchedule):
+    x, y, is_break = timeline(schedule)
+    self.data_line_y.setData(x, y)
+    self.breaks.setOpts(x0=x[::2][is_break], x1=x[1::2][is_break])
+    if len(schedule) <= MARKER_MAX_LEVELS:
+      self.level_markers.setData(x[::2][~is_break], y[::2][~is_break])
+    else:
+      self.level_markers.setData([], [])
+    self.plotted = schedule
+    self.update_now_cursor()
+
+  def update_now_cursor(self):
+    if self.engine is None:
+      return
+    now_h = self.engine.schedule_elapsed() / 3600
+    # a second is less than a pixel of a long structure, the plot is only repainted when the cursor really moves
+    if self.isVisible() and self.now_cursor.isVisible():
+      if abs(now_h - self.now_cursor.value()) < self.graphWidget.getViewBox().viewPixelSize()[0]:
+        return
+    self.now_cursor.setValue(now_h)
+    self.now_cursor.setVisible(True)
+
+  def showEvent(self, event) -> None:
+    if self.engine is not None:
+      self.update_now_cursor()
+      self.now_timer.start(NOW_INTERVAL_MS)
+    super().showEvent(event)
+
+  def hideEvent(self, event) -> None:
+    self.now_timer.stop() # nothing to draw for while hidden
+    super().hideEvent(event)
 
@@ -0,0 +1,229 @@
+import json
+import mmap
+import os
+import socket
+import struct
+import tempfile
+from pathlib import Path
+
+from config import PokerConfig, dump_config_to_json
+from engine import EVENT_KINDS, EngineEvent, TournamentEngine
+from fanout import REMOTE_EVENTS, FanoutClient, apply_published_state, config_hash
+from field import FieldDelta
+
+# One authority process publishes its clock into a memory-mapped file, displays on the same
+# machine read it every frame. time.monotonic() is system wide, so deadlines need no offset.
+SEGMENT_NAME = "poker_timer"
+SEGMENT_SIZE = 1 << 20 # header plus the config json, untouched pages cost no memory
+MAGIC = b"PTC1"
+# magic, seq, position, last event, started, running, paused, deadline, remaining, paused_at, created,
+# config hash, entries, busts, rebuys, addons, control port, config json length
+HEADER = struct.Struct("<4sQib???dddd16siiiiHI")
+FIELDS = ("magic", "seq", "position", "event", "started", "running", "paused", "deadline", "remaining",
+          "paused_at", "created", "config", "entries", "busts", "rebuys", "addons", "port", "config_len")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 4
+READ_RETRIES = 100 # a write takes microseconds, a reader that keeps losing the race tries again next frame
+COMMANDS = ("toggle", "next", "prev", "reset", "field")
+
+
+def valid_command(command) -> bool:
+  # the port takes datagrams from anything on the machine, a bad one is dropped before the GUI thread sees it
+  if not isinstance(command, dict) or command.get("op") not in COMMANDS:
+    return False
+  if command["op"] == "field":
+    count = command.get("count", 1)
+    return command.get("name") in FieldDelta._fields and isinstance(count, int) and not isinstance(count, bool)
+  return True
+
+
+def segment_path(name: str = SEGMENT_NAME) -> Path:
+  # tmpfs where there is one, the pages are shared either way
+  directory = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+  return directory / f"{name}.clock"
+
+
+class SharedClockPublisher:
+  # Writes the engine state into the segment under a seqlock: the sequence number is odd while a write
+  # is in progress, readers retry when it was odd or changed during their copy. There is one writer.
+  def __init__(self, engine: TournamentEngine, field=None, name: str = SEGMENT_NAME):
+    self.engine = engine
+    self.field = field
+    self.path = segment_path(name)
+    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+      os.ftruncate(fd, SEGMENT_SIZE)
+      self.segment = mmap.mmap(fd, SEGMENT_SIZE)
+    finally:
+      os.close(fd)
+    # a restarted authority reuses the file, displays keep their mapping and see the sequence move on
+    seq = SEQ.unpack_from(self.segment, SEQ_OFFSET)[0]
+    self.seq = seq + (seq & 1)
+    self.control = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self.control.bind(("127.0.0.1", 0))
+    self.control.setblocking(False) # drained by the GUI thread, which owns the engine
+    self.event = "config"
+    self.hashed = (None, None) # (schedule, hash)
+    self.written_config = None
+    self.published = None
+    self.writes = 0
+
+  def start(self):
+    self.engine.listeners.append(self.on_engine_event)
+    self.publish()
+
+  def on_engine_event(self, event: EngineEvent):
+    self.event = event.kind
+    self.publish()
+
+  def values(self) -> tuple:
+    engine = self.engine
+    if self.hashed[0] is not engine.schedule:
+      self.hashed = (engine.schedule, config_hash(engine.config))
+    field = self.field
+    counts = (0, 0, 0, 0) if field is None else (field.entries, field.busts, field.rebuys, field.addons)
+    return (engine.position, EVENT_KINDS.index(self.event), engine.started, engine.is_running,
+            engine.pause_started is not None, engine.clock.deadline or 0.0, engine.clock.remaining_at_stop,
+            engine.pause_started or 0.0, engine.created_at, self.hashed[1].encode(), *counts)
+
+  def publish(self) -> bool:
+    # cheap to call every frame, the segment is only written when something changed
+    values = self.values()
+    if values == self.published:
+      return False
+    config = None
+    if self.written_config != values[9]:
+      config = json.dumps(dump_config_to_json(self.engine.config), separators=(",", ":")).encode()
+      if HEADER.size + len(config) > SEGMENT_SIZE:
+        print(f"Config {self.engine.config.NAME} does not fit in the shared clock segment")
+        return False
+    config_len = len(config) if config is not None else HEADER.unpack_from(self.segment)[-1]
+    segment = self.segment
+    SEQ.pack_into(segment, SEQ_OFFSET, self.seq + 1) # odd: readers wait
+    if config is not None:
+      segment[HEADER.size:HEADER.size + len(config)] = config
+    HEADER.pack_into(segment, 0, MAGIC, self.seq + 1, *values, self.control.getsockname()[1], config_len)
+    self.seq += 2
+    SEQ.pack_into(segment, SEQ_OFFSET, self.seq)
+    self.written_config = values[9]
+    self.published = values
+    self.writes += 1
+    return True
+
+  def commands(self) -> list[dict]:
+    # controls pressed on the displays since the last call
+    received = []
+    while True:
+      try:
+        data = self.control.recv(4096)
+      except OSError: # BlockingIOError once drained
+        return received
+      try:
+        command = json.loads(data)
+      except ValueError: # not json, or not even utf-8
+        continue
+      if valid_command(command):
+        received.append(command)
+
+
+class SharedClockReader:
+  # A display's view of the segment: poll() every frame costs one 8 byte read while nothing changed
+  def __init__(self, name: str = SEGMENT_NAME, field=None):
+    self.path = segment_path(name)
+    self.field = field
+    self.segment = None
+    self.seq = None
+    self.state = {}
+    self.configs: dict[str, PokerConfig] = {}
+    self.hashed = (None, None) # (schedule, hash) of the config shown
+    self.control = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self.retries = 0
+
+  def open(self) -> bool:
+    try:
+      with open(self.path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < SEGMENT_SIZE:
+          return False
+        self.segment = mmap.mmap(f.fileno(), SEGMENT_SIZE, access=mmap.ACCESS_READ)
+    except OSError:
+      return False # no authority yet
+    return True
+
+  def read(self) -> tuple[dict, bytes | None] | None:
+    # a consistent copy of the header (and the config json when it is new to us), None if unchanged
+    if self.segment is None and not self.open():
+      return None
+    segment = self.segment
+    for _ in range(READ_RETRIES):
+      seq = SEQ.unpack_from(segment, SEQ_OFFSET)[0]
+      if seq == self.seq:
+        return None
+      if seq & 1:
+        self.retries += 1
+        continue
+      state = dict(zip(FIELDS, HEADER.unpack_from(segment)))
+      state["config"] = state["config"].decode()
+      config = None
+      if state["config"] not in self.configs and state["config"] != self.hashed[1]:
+        config = segment[HEADER.size:HEADER.size + state["config_len"]]
+      if SEQ.unpack_from(segment, SEQ_OFFSET)[0] == seq:
+        if state["magic"] != MAGIC:
+          return None
+        self.seq = seq
+        return state, config
+      self.retries += 1
+    return None
+
+  def poll(self, engine: TournamentEngine) -> list[str]:
+    # applies a new state, returns the kind of event it came from if the engine changed
+    if self.hashed[0] is not engine.config.compiled():
+      self.hashed = (engine.config.compiled(), config_hash(engine.config))
+    snapshot = self.read()
+    if snapshot is None:
+      return []
+    state, config_json = snapshot
+    if config_json is not None:
+      self.configs[state["config"]] = FanoutClient.to_config(json.loads(config_json))
+    self.state = state
+    if self.field is not None:
+      self.field.entries, self.field.busts = state["entries"], state["busts"]
+      self.field.rebuys, self.field.addons = state["rebuys"], state["addons"]
+    config = engine.config if self.hashed[1] == state["config"] else self.configs[state["config"]]
+    published = {"position": state["position"],
+                 "deadline": state["deadline"] if state["running"] else None,
+                 "remaining": state["remaining"],
+                 "started": state["started"],
+                 "paused_at": state["paused_at"] if state["paused"] else None,
+                 "created": state["created"]}
+    if not apply_published_state(engine, published, config):
+      return []
+    kind = EVENT_KINDS[state["event"]]
+    engine.emit(kind if kind in REMOTE_EVENTS else "sync")
+    return [kind]
+
+  def send(self, op: str, **fields):
+    # a control pressed on this display, the authority applies it and publishes the result
+    if not self.state:
+      return
+    try:
+      self.control.sendto(json.dumps({"op": op, **fields}).encode(), ("127.0.0.1", self.state["port"]))
+    except OSError as e:
+      print(f"Shared clock authority unreachable: {e!r}")
+
+
+if __name__ == "__main__":
+  # print what the segment holds, e.g. to check that the authority is publishing
+  import argparse as argp
+  import time
+  parser = argp.ArgumentParser(description="Show the shared clock segment of a local authority")
+  parser.add_argument("name", nargs="?", default=SEGMENT_NAME)
+  args = parser.parse_args()
+  reader = SharedClockReader(args.name)
+  snapshot = reader.read()
+  if snapshot is None:
+    print(f"No shared clock at {reader.path}")
+  else:
+    state, _ = snapshot
+    if state["running"]:
+      print(f"{state['deadline'] - time.monotonic():.3f} s left of position {state['position']}")
+    print({name: val for name, val in state.items() if name != "magic"})
@@ -0,0 +1,134 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from config import PokerConfig, load_config_from_json
+from schedule import LevelSchedule
+
+# Push/fold model, one step is one hand dealt at every table
+HANDS_PER_HOUR = 30
+TABLE_SIZE = 9
+PUSH_M = 8 # below this M-ratio a player moves all in when it is their turn
+CLASH_RATE = 0.02 # chance per hand that a deeper stack still ends up all in
+MAX_HOURS = 48
+CHUNK_CELLS = 2_000_000 # tournaments * players simulated at once by a worker
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def hand_timeline(schedule: LevelSchedule, max_hours: float = MAX_HOURS):
+  # Clock time, level, chips paid per player and M-ratio unit of every hand,
+  # no hands are dealt during breaks and the last level runs on after the schedule ends
+  hand_s = 3600 / HANDS_PER_HOUR
+  times, levels, entries = [], [], []
+  for entry, start in zip(schedule.entries, schedule.starts):
+    if entry.is_break:
+      continue
+    n = math.ceil(entry.duration_s / hand_s)
+    times.append(start + hand_s * np.arange(n))
+    levels.append(np.full(n, entry.level))
+    entries.append(np.full(n, len(entries)))
+  played = [entry for entry in schedule.entries if not entry.is_break]
+  n = max(0, math.ceil((max_hours * 3600 - schedule.total_s) / hand_s))
+  times.append(schedule.total_s + hand_s * np.arange(n))
+  levels.append(np.full(n, played[-1].level))
+  entries.append(np.full(n, len(played)-1))
+  entries = np.concatenate(entries)
+  sb = np.array([entry.small_blind for entry in played], dtype=float)[entries]
+  bb = np.array([entry.big_blind for entry in played], dtype=float)[entries]
+  ante = np.array([entry.ante for entry in played], dtype=float)[entries]
+  cost = (sb + bb) / TABLE_SIZE + ante # average chips a player puts in per hand
+  m_unit = sb + bb + ante * TABLE_SIZE # Harrington's M: stack / cost of an orbit
+  return np.concatenate(times), np.concatenate(levels), cost, m_unit
+
+
+def simulate_chunk(timeline, players: int, stack: int, tournaments: int, seed) -> np.ndarray:
+  # index of the hand on which each tournament ended, -1 if it outlasted the timeline
+  _, _, cost, m_unit = timeline
+  rng = np.random.default_rng(seed)
+  stacks = np.full((tournaments, players), float(stack))
+  finish = np.full(tournaments, -1)
+  pairs = players // 2
+  for step in range(len(cost)):
+    running = np.flatnonzero(finish < 0)
+    if running.size == 0:
+      break
+    s = stacks[running]
+    rows = np.arange(running.size)
+    alive = s > 0
+    # blinds and antes go to one random player at the table, chips are conserved
+    paid = np.minimum(s, cost[step]) * alive
+    s -= paid
+    taker = np.argmax(rng.random(s.shape) * alive, axis=1)
+    s[rows, taker] += paid.sum(axis=1)
+    # all-in confrontations between randomly paired players
+    alive = s > 0
+    short = (s / m_unit[step] < PUSH_M) & (rng.random(s.shape) < 1 / TABLE_SIZE)
+    trigger = alive & (short | (rng.random(s.shape) < CLASH_RATE))
+    order = np.argsort(np.where(alive, rng.random(s.shape), 2.0), axis=1)
+    a, b = order[:, 0:2*pairs:2], order[:, 1:2*pairs:2]
+    sa, sb = np.take_along_axis(s, a, 1), np.take_along_axis(s, b, 1)
+    valid = (sa > 0) & (sb > 0) & (np.take_along_axis(trigger, a, 1) | np.take_along_axis(trigger, b, 1))
+    amount = np.minimum(sa, sb) * valid
+    delta = np.where(rng.random(amount.shape) < 0.5, amount, -amount)
+    np.put_along_axis(s, a, sa + delta, 1)
+    np.put_along_axis(s, b, sb - delta, 1)
+    stacks[running] = s
+    finish[running[(s > 0).sum(axis=1) <= 1]] = step
+  return finish
+
+
+def simulate(config: PokerConfig, players: int, tournaments: int = 20_000,
+             workers: int | None = None, seed: int | None = None) -> dict:
+  timeline = hand_timeline(config.compiled())
+  workers = workers or os.cpu_count() or 1
+  chunk = max(1, min(math.ceil(tournaments / workers), CHUNK_CELLS // players))
+  sizes = [min(chunk, tournaments - start) for start in range(0, tournaments, chunk)]
+  seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+  t0 = time.perf_counter()
+  if workers == 1:
+    finishes = [simulate_chunk(timeline, players, config.STARTING_CHIP_AMOUNT, n, s) for n, s in zip(sizes, seeds)]
+  else:
+    # spawn: forking a process that runs Qt and the audio thread is not safe
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+      finishes = list(pool.map(simulate_chunk, *zip(*[(timeline, players, config.STARTING_CHIP_AMOUNT, n, s)
+                                                       for n, s in zip(sizes, seeds)])))
+  finish = np.concatenate(finishes)
+  times, levels = timeline[0], timeline[1]
+  done = finish >= 0
+  return {"name": config.NAME,
+          "players": players,
+          "tournaments": tournaments,
+          "unfinished": int((~done).sum()), # still running after MAX_HOURS
+          "seconds": round(time.perf_counter() - t0, 3),
+          "minutes": dict(zip(PERCENTILES, np.percentile(times[finish[done]] / 60, PERCENTILES).round(1).tolist())) if done.any() else {},
+          "level": dict(zip(PERCENTILES, np.percentile(levels[finish[done]], PERCENTILES).tolist())) if done.any() else {}}
+
+
+def format_report(result: dict) -> str:
+  lines = [f"{result['name']}, {result['players']} players, {result['tournaments']} tournaments "
+           f"in {result['seconds']} s ({result['unfinished']} unfinished after {MAX_HOURS} h)"]
+  for p in result["minutes"]:
+    minutes = result["minutes"][p]
+    lines.append(f"  p{p:<3} {int(minutes // 60)}:{int(minutes % 60):02d} h  level {result['level'][p]:.0f}")
+  return "\n".join(lines)
+
+
+if __name__ == "__main__":
+  import argparse as argp
+  parser = argp.ArgumentParser(description="Monte Carlo estimate of how long a structure runs")
+  parser.add_argument("config", type=Path, help="Path to a .json file with PokerConfig")
+  parser.add_argument("-p", "--players", required=True, type=int)
+  parser.add_argument("-n", "--tournaments", default=20_000, type=int)
+  parser.add_argument("-w", "--workers", default=None, type=int, help="Processes, defaults to the CPU count")
+  parser.add_argument("--seed", default=None, type=int)
+  args = parser.parse_args()
+
+  cfg = load_config_from_json(args.config)
+  if not cfg:
+    raise ValueError(f"Config file {args.config.absolute()} does not exist!")
+  print(format_report(simulate(cfg, args.players, args.tournaments, args.workers, args.seed)))
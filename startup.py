@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+
+# imported first by poker_timer.py so the report starts close to interpreter start
+T0 = time.perf_counter()
+
+
+class StartupReport:
+  def __init__(self, t0: float = T0):
+    self.t0 = t0
+    self.phases: list[tuple[str, float, float]] = [] # (name, start, end) relative to t0
+
+  @contextmanager
+  def phase(self, name: str):
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.phases.append((name, start - self.t0, time.perf_counter() - self.t0))
+
+  def mark(self, name: str):
+    # milestone measured from t0, e.g. the first paint
+    self.phases.append((name, 0.0, time.perf_counter() - self.t0))
+
+  def report(self) -> str:
+    lines = ["Startup timing (ms):", f"{'phase':<28}{'start':>9}{'took':>9}"]
+    for name, start, end in self.phases:
+      lines.append(f"{name:<28}{start * 1000:>9.1f}{(end - start) * 1000:>9.1f}")
+    return "\n".join(lines)
+
+
+STARTUP = StartupReport()
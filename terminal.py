@@ -0,0 +1,159 @@
+import curses
+from pathlib import Path
+
+from config_library import ConfigLibrary
+from engine import EngineEvent, TournamentEngine
+
+# 5 rows per glyph, the round timer is drawn with these when the terminal is wide enough
+BIG_GLYPHS = {
+  "0": ("█████", "█   █", "█   █", "█   █", "█████"),
+  "1": ("   █ ", "  ██ ", "   █ ", "   █ ", "  ███"),
+  "2": ("█████", "    █", "█████", "█    ", "█████"),
+  "3": ("█████", "    █", " ████", "    █", "█████"),
+  "4": ("█   █", "█   █", "█████", "    █", "    █"),
+  "5": ("█████", "█    ", "█████", "    █", "█████"),
+  "6": ("█████", "█    ", "█████", "█   █", "█████"),
+  "7": ("█████", "    █", "   █ ", "  █  ", "  █  "),
+  "8": ("█████", "█   █", "█████", "█   █", "█████"),
+  "9": ("█████", "█   █", "█████", "    █", "█████"),
+  ":": ("   ", " █ ", "   ", " █ ", "   "),
+  " ": ("   ", "   ", "   ", "   ", "   "),
+}
+MAX_SLEEP_MS = 500 # upper bound between redraws, the total and break timers tick too
+KEYS = "[space] start/stop  [n]/[→] next  [p]/[←] prev  [r] reset  [q] quit"
+
+
+def big_text(text: str) -> list[str]:
+  return [" ".join(BIG_GLYPHS[ch][row] for ch in text) for row in range(5)]
+
+
+def hms(seconds: float) -> str:
+  seconds = int(seconds)
+  return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class TerminalDisplay:
+  # The texts of MainWindowDisplay and the MainWindowControls buttons, in a terminal
+  def __init__(self, screen, engine: TournamentEngine):
+    self.screen = screen
+    self.engine = engine
+    self.bell = False
+    engine.listeners.append(self.on_engine_event)
+
+  def on_engine_event(self, event: EngineEvent):
+    if event.kind in ("timeout", "finished"):
+      self.bell = True
+
+  def texts(self) -> dict:
+    engine = self.engine
+    level, m, s, bb, sb, nbb, nsb = engine.get_state()
+    entry = engine.current_entry()
+    # same vanishing colon as the GUI, hidden 300-400 ms into the second
+    colon = " " if 300 < engine.clock.subsecond_ms() < 400 else ":"
+    if entry.is_break:
+      blinds = "BREAK"
+    elif entry.ante:
+      blinds = f"{sb}/{bb}/{entry.ante}"
+    else:
+      blinds = f"{sb}/{bb}"
+    return {"round_timer": f"{m:02d}{colon}{s:02d}",
+            "blinds": blinds,
+            "next_blinds": f"NEXT:{nsb}/{nbb}",
+            "level": f"LEVEL {level:02d}",
+            "total_timer": hms(engine.total_elapsed()),
+            "break_timer": f"BREAK {hms(engine.break_elapsed())[3:]}" if engine.pause_started is not None else ""}
+
+  def draw(self):
+    texts = self.texts()
+    height, width = self.screen.getmaxyx()
+    self.screen.erase()
+    def put(y: int, text: str, attr: int = curses.A_BOLD):
+      if 0 <= y < height:
+        self.screen.addstr(y, max(0, (width - len(text)) // 2), text[:width - 1], attr)
+    put(0, f"{self.engine.config.NAME}   {texts['level']}   {texts['total_timer']}")
+    timer = big_text(texts["round_timer"])
+    if len(timer[0]) < width and height >= 12:
+      for row, line in enumerate(timer):
+        put(2 + row, line)
+      y = 8
+    else:
+      put(2, texts["round_timer"])
+      y = 4
+    put(y, texts["blinds"])
+    put(y + 1, texts["next_blinds"], curses.A_NORMAL)
+    put(y + 3, texts["break_timer"])
+    put(height - 1, KEYS, curses.A_DIM)
+    self.screen.refresh() # curses only writes the cells that changed
+    if self.bell:
+      curses.beep()
+      self.bell = False
+
+  def handle_key(self, key: int) -> bool:
+    engine = self.engine
+    if key in (ord("q"), 27):
+      return False
+    if key == ord(" "):
+      engine.toggle()
+    elif key in (ord("n"), curses.KEY_RIGHT):
+      engine.nxt_level()
+    elif key in (ord("p"), curses.KEY_LEFT):
+      engine.prev_level()
+    elif key == ord("r"):
+      engine.reset_level()
+    return True
+
+  def run(self):
+    curses.curs_set(0)
+    while True:
+      self.engine.update_from_clock()
+      self.draw()
+      wait_ms = self.engine.clock.next_wakeup_ms() if self.engine.is_running else MAX_SLEEP_MS
+      self.screen.timeout(min(MAX_SLEEP_MS, wait_ms))
+      key = self.screen.getch()
+      if key != -1 and not self.handle_key(key):
+        return
+
+
+def main(argv: list[str] | None = None) -> int:
+  import argparse as argp
+  parser = argp.ArgumentParser(description="Poker timer in the terminal")
+  parser.add_argument("--terminal", action="store_true")
+  parser.add_argument("-c", "--config", default=Path("configs/t10000.json"), type=Path, help="Path to a .json file with PokerConfig")
+  parser.add_argument("-n", "--name", default=None, help="NAME of a config in --config-dir, instead of --config")
+  parser.add_argument("--config-dir", default=Path("configs"), type=Path, help="Directory of the config library")
+  parser.add_argument("-j", "--journal", default=None, type=Path, help="Journal file, the clock is restored from it after a crash")
+  args, _ = parser.parse_known_args(argv) # the GUI-only options are ignored
+  library = ConfigLibrary(args.config_dir)
+  if args.name is not None:
+    library.scan()
+    args.config = library.path_of(args.name)
+    if args.config is None:
+      raise ValueError(f"No config named {args.name} in {args.config_dir.absolute()}, known: {library.names()}")
+  journal, restored = None, None
+  if args.journal is not None:
+    from journal import Journal, apply_state
+    journal = Journal(args.journal)
+    restored = journal.restore()
+    if restored is not None and restored.config is not None and Path(restored.config).exists():
+      args.config = Path(restored.config)
+  config = library.get(args.config)
+  if not config:
+    raise ValueError(f"Invalid config {args.config.absolute()}: {library.errors().get(args.config.resolve())}")
+  engine = TournamentEngine(config)
+  engine.get_state()
+  if restored is not None:
+    apply_state(engine, restored)
+  if journal is not None:
+    journal.attach(engine)
+    journal.record_config(args.config)
+  try:
+    curses.wrapper(lambda screen: TerminalDisplay(screen, engine).run())
+  finally:
+    if journal is not None:
+      journal.close()
+  return 0
+
+
+if __name__ == "__main__":
+  import sys
+  sys.exit(main(sys.argv[1:]))
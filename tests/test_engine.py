@@ -0,0 +1,86 @@
+import copy
+from pathlib import Path
+
+from clock import DeadlineClock, VirtualClock
+from config import load_config_from_json
+from engine import LEVEL_CHANGE_KINDS, TournamentEngine, replay
+
+CONFIGS = Path(__file__).parent.parent / "configs"
+
+
+def level_changes(events) -> list[tuple[float, str, int]]:
+  return [(round(event.at, 3), event.kind, event.level) for event in events
+          if event.kind in LEVEL_CHANGE_KINDS or event.kind == "finished"]
+
+
+def test_replay_plays_every_level_to_the_end():
+  config = load_config_from_json(CONFIGS / "t10000_long.json")
+  schedule = config.compiled()
+  events = replay(config)
+  assert events[0].kind == "start"
+  assert [event.kind for event in events[1:-1]] == ["timeout"] * (len(schedule)-1)
+  assert [event.level for event in events[1:-1]] == [entry.level for entry in schedule.entries[1:]]
+  assert events[-1].kind == "finished"
+  assert events[-1].at == schedule.total_s
+
+
+def test_polled_replay_matches_deadline_replay():
+  # the GUI polls the clock, levels must still change on the deadlines and not drift with the ticks
+  config = load_config_from_json(CONFIGS / "t10000_long.json")
+  polled, exact = level_changes(replay(config, tick_s=0.7)), level_changes(replay(config))
+  assert [change[1:] for change in polled] == [change[1:] for change in exact]
+  assert all(0 <= late[0] - on_time[0] < 0.7 for late, on_time in zip(polled, exact))
+
+
+def test_breaks_are_played_between_levels():
+  config = copy.copy(load_config_from_json(CONFIGS / "t1000.json"))
+  config.schedule = None
+  config.BREAKS = [[2, [10, 0]]]
+  events = replay(config)
+  assert events[-1].at == config.compiled().total_s
+  timeouts = [event for event in events if event.kind == "timeout"]
+  assert (timeouts[1].level, timeouts[2].level) == (2, 3) # level 2, its break, level 3
+  assert timeouts[2].at - timeouts[1].at == 600
+
+
+def test_pause_stops_the_level_clock():
+  virtual = VirtualClock()
+  engine = TournamentEngine(load_config_from_json(CONFIGS / "t1000.json"), DeadlineClock(virtual))
+  engine.start()
+  virtual.advance(100)
+  engine.pause()
+  virtual.advance(1000)
+  engine.update_from_clock()
+  assert engine.position == 0
+  assert engine.schedule_elapsed() == 100
+  assert engine.break_elapsed() == 1000
+
+
+
+def test_finished_tournament_does_not_start_again():
+  virtual = VirtualClock()
+  engine = TournamentEngine(load_config_from_json(CONFIGS / "t1000.json"), DeadlineClock(virtual))
+  engine.start()
+  virtual.advance(engine.schedule.total_s + 5) # the last wakeup came late
+  engine.update_from_clock()
+  while engine.is_running:
+    engine.update_from_clock()
+  assert engine.is_finished
+  assert engine.clock.remaining() == 0
+  engine.start()
+  assert not engine.is_running
+  engine.prev_level() # a level change reopens the tournament
+  engine.start()
+  assert engine.is_running
+
+
+def test_reload_with_a_new_break_keeps_the_running_level():
+  virtual = VirtualClock()
+  config = load_config_from_json(CONFIGS / "t10000.json")
+  engine = TournamentEngine(config, DeadlineClock(virtual))
+  engine.position = 3
+  edited = copy.copy(config)
+  edited.schedule = None
+  edited.BREAKS = [[1, [10, 0]]]
+  engine.update_config(edited, update_counters=False)
+  assert (engine.current_level, engine.current_entry().is_break) == (4, False)
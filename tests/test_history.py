@@ -0,0 +1,37 @@
+import copy
+from pathlib import Path
+
+from clock import DeadlineClock, VirtualClock
+from config import load_config_from_json
+from engine import TournamentEngine
+from history import KINDS, HistoryRecorder, load
+
+CONFIGS = Path(__file__).parent.parent / "configs"
+
+
+def test_reload_while_running_starts_a_new_run(tmp_path: Path):
+  virtual = VirtualClock()
+  engine = TournamentEngine(load_config_from_json(CONFIGS / "t1000.json"), DeadlineClock(virtual))
+  engine.get_state()
+  recorder = HistoryRecorder(tmp_path)
+  recorder.attach(engine)
+  engine.start()
+  virtual.advance(60)
+  engine.nxt_level()
+  virtual.advance(60)
+  engine.config = copy.copy(load_config_from_json(CONFIGS / "t1500.json"))
+  engine.get_state() # the settings window loading another structure: "reset", then "config"
+  virtual.advance(30)
+  recorder.close()
+
+  history = load(tmp_path)
+  runs, spans = history["runs"], history["spans"]
+  first, second = sorted(runs["run"].tolist())
+  assert runs["name"][runs["run"] == first].tolist() == ["T1000"]
+  assert runs["name"][runs["run"] == second].tolist() == ["T1500"]
+  assert runs["manual"][runs["run"] == first].tolist() == [1] # the next, the load is no manual reset
+  assert spans["level"][spans["run"] == first].tolist() == [1, 2]
+  assert spans["wall_s"][spans["run"] == first].tolist() == [60, 60]
+  assert spans["level"][spans["run"] == second].tolist() == [1]
+  assert spans["wall_s"][spans["run"] == second].tolist() == [30]
+  assert KINDS.index("reset") not in history["events"]["kind"].tolist()
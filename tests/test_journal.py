@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from clock import DeadlineClock, VirtualClock
+from config import load_config_from_json
+from engine import TournamentEngine
+from journal import Journal, apply_state
+
+CONFIGS = Path(__file__).parent.parent / "configs"
+
+
+def test_running_tournament_is_restored_after_a_crash(tmp_path: Path):
+  virtual = VirtualClock()
+  engine = TournamentEngine(load_config_from_json(CONFIGS / "t1000.json"), DeadlineClock(virtual))
+  journal = Journal(tmp_path / "journal.jsonl", fsync_interval_s=0)
+  journal.attach(engine)
+  journal.record_config(CONFIGS / "t1000.json")
+  engine.start()
+  virtual.advance(100)
+  engine.nxt_level()
+  virtual.advance(30)
+  engine.pause()
+  virtual.advance(10)
+  engine.start() # the last record: level 2 running with 30 s played
+  journal.close()
+  with open(journal.path, "ab") as f:
+    f.write(b'{"kind": "ne') # the write the crash tore
+
+  for snapshot in (True, False): # from the snapshot, and replaying the whole journal without it
+    if not snapshot:
+      journal.snapshot_path.unlink()
+    state = Journal(journal.path).restore()
+    assert (state.kind, state.position, state.running) == ("start", 1, True)
+    assert state.config == str((CONFIGS / "t1000.json").resolve())
+
+    restored = TournamentEngine(load_config_from_json(Path(state.config)), DeadlineClock(VirtualClock()))
+    apply_state(restored, state)
+    assert restored.is_running
+    assert restored.current_level == 2
+    # the wall time between the record and the restore keeps counting
+    assert 0 <= restored.schedule_elapsed() - (20 * 60 + 30) < 1
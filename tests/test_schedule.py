@@ -0,0 +1,50 @@
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from config import dump_config_to_json, format_config_json, load_config_from_json
+from schedule import ScheduleError
+
+CONFIGS = Path(__file__).parent.parent / "configs"
+
+
+@pytest.mark.parametrize("path", sorted(CONFIGS.glob("*.json")), ids=lambda path: path.name)
+def test_configs_round_trip(path: Path, tmp_path: Path):
+  config = load_config_from_json(path)
+  written = tmp_path / path.name
+  written.write_text(format_config_json(dump_config_to_json(config)))
+  assert load_config_from_json(written).compiled().entries == config.compiled().entries
+
+
+def test_round_trip_with_every_optional_key(tmp_path: Path):
+  config = copy.copy(load_config_from_json(CONFIGS / "t1000.json"))
+  config.schedule = None
+  levels = len(config.BIG_BLIND_VALUES)
+  config.ANTE_VALUES = [0] * (levels // 2) + [5] * (levels - levels // 2)
+  config.LEVEL_PERIODS = [[15, 0]] * levels
+  config.BREAKS = [[4, [10, 0]]]
+  config.REBUY_CHIPS = 1500
+  written = tmp_path / "edited.json"
+  written.write_text(format_config_json(dump_config_to_json(config)))
+  loaded = load_config_from_json(written)
+  assert loaded.compiled().entries == config.compiled().entries
+  assert loaded.REBUY_CHIPS == 1500
+
+
+@pytest.mark.parametrize("change, error", [
+  ({"LEVEL_PERIOD": None}, "Missing key LEVEL_PERIOD"),
+  ({"EXTRA": 1}, "Unknown key EXTRA"),
+  ({"LEVEL_PERIOD": ["20", 0]}, "LEVEL_PERIOD must be"),
+  ({"BIG_BLIND_VALUES": [20, 30, 45]}, "Level 3: small blind 22 is not a multiple of chip increment 5"),
+])
+def test_invalid_files_raise_every_error(change: dict, error: str, tmp_path: Path):
+  cdict = json.loads((CONFIGS / "t1000.json").read_text())
+  cdict.update(change)
+  cdict = {name: val for name, val in cdict.items() if val is not None}
+  written = tmp_path / "invalid.json"
+  written.write_text(json.dumps(cdict))
+  with pytest.raises(ScheduleError) as raised:
+    load_config_from_json(written)
+  assert any(found.startswith(error) for found in raised.value.errors)
@@ -0,0 +1,28 @@
+import json
+from pathlib import Path
+
+from validate import check_file, validate
+
+CONFIGS = Path(__file__).parent.parent / "configs"
+
+
+def test_bundled_configs_are_valid_and_canonical():
+  report = validate([CONFIGS])
+  assert report["files"] == len(list(CONFIGS.glob("*.json")))
+  assert [(result["path"], result["errors"]) for result in report["results"] if result["errors"]] == []
+  assert (report["invalid"], report["not_canonical"], report["duplicates"]) == (0, 0, {})
+
+
+def test_only_content_makes_a_file_not_canonical(tmp_path: Path):
+  cdict = json.loads((CONFIGS / "t1000.json").read_text())
+  compact = tmp_path / "compact.json"
+  compact.write_text(json.dumps(cdict, separators=(",", ":")))
+  assert check_file(compact)["canonical"] is None
+  reordered = tmp_path / "reordered.json"
+  reordered.write_text(json.dumps(dict(reversed(list(cdict.items())))))
+  assert json.loads(check_file(reordered)["canonical"]) == cdict
+
+
+def test_directory_matching_the_pattern_is_an_error(tmp_path: Path):
+  (tmp_path / "x.json").mkdir()
+  assert check_file(tmp_path / "x.json")["errors"] == ["Not a config file"]
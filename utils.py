@@ -1,15 +1,22 @@
-import json
-from dataclasses import dataclass
+import time
+from collections import OrderedDict
 from enum import Enum, unique
+from functools import lru_cache
 from pathlib import Path
 
-from numpy import asarray
 from PyQt5 import QtCore
-from PyQt5.QtCore import QSize
-from PyQt5.QtGui import QFont, QFontDatabase, QMouseEvent
+from PyQt5.QtCore import QSize, QTimer
+from PyQt5.QtGui import QFont, QFontDatabase, QMouseEvent, QPainter, QPixmap
 from PyQt5.QtWidgets import (QGridLayout, QHBoxLayout, QLabel, QMessageBox,
                              QPushButton, QSizePolicy, QWidget)
 
+from audio import AudioCues
+from clock import DeadlineClock
+from config import MyTime, PokerConfig, dump_config_to_json, load_config_from_json
+from engine import TournamentEngine
+from metrics import METRICS
+from profiler import PROFILER
+
 @unique
 class WindowGeometry(Enum):
   UHD = QSize(3840, 2160)
@@ -35,115 +42,37 @@ class FontFamilies(Enum):
   SPACE_GROT_REG = "SpaceGrotesk"
 
 
-class MyTime:
-  def __init__(self, m:int, s:int):
-    self.m = m
-    self.s = s
-
-  @classmethod
-  def fromstr(cls, string:str):
-    if ":" in string:
-      x = string.split(":")
-      m, s = int(x[0]), int(x[-1])
-    else:
-      m = int(string)
-      s = 0
-    return cls(m,s)
-
-  def _list(self):
-    return list((self.m, self.s))
-
-  def _arr(self):
-    return asarray([self.m, self.s])
-
-
-@dataclass
-class PokerConfig:
-  NAME: str = "NULL"
-  STARTING_CHIP_AMOUNT: int = -1
-  CHIP_INCREMENT : int = -1 # Smallest difference between chips
-  BIG_BLIND_VALUES : any = -1 # BB Values for every level of the game
-  LEVEL_PERIOD : MyTime = MyTime(-1,-1)
-  NEW : bool = False
-
 Family =  MonospacedFontFamilies.MONOFONTO.value
 Family2 = MonospacedFontFamilies.MONOFONTO.value
 Family3 = FontFamilies.SPACE_GROT_REG.value
 
 
-class PokerGameState:
+class PokerGameState(TournamentEngine):
+  # TournamentEngine with audio cues scheduled against the level deadline
   def __init__(self,
-               config: PokerConfig
+               config: PokerConfig,
+               clock: DeadlineClock | None = None,
+               load_sounds_async: bool = False,
+               audio: bool = True
                ):
-    self.current_level = 1
-    from pygame import mixer
-    mixer.init()
-    self.beep = mixer.Sound("noises/box1.wav")
-    self.update_config(config)
-
-  def update_config(self, config: PokerConfig, update_counters: bool = True):
-    self.config = config
-    assert(isinstance(config.LEVEL_PERIOD, MyTime))
-    assert(isinstance(config.BIG_BLIND_VALUES, list))
-
-    if update_counters:
-      self.reset_timer()
-
-  def get_state(self):
-    if self.config.NEW:
-      self.config.NEW = False
-      self.reset_level()
-
-    cur_bb = self.config.BIG_BLIND_VALUES[self.current_level-1]
-    cur_sb = int(cur_bb / 2)
-    if cur_sb % self.config.CHIP_INCREMENT != 0:
-      raise ValueError(f"Small Blind cannot be smaller than chip increment sb: {cur_sb}, chip_inc: {self.config.CHIP_INCREMENT}")
-    if (self.current_level != len(self.config.BIG_BLIND_VALUES)-1):
-      nxt_bb = self.config.BIG_BLIND_VALUES[self.current_level]
-      nxt_sb = int(nxt_bb / 2)
-    else:
-      nxt_bb = "N/A"
-      nxt_sb = "N/A"
-    return [self.current_level,
-            self.minute, self.second,
-            cur_bb, cur_sb,
-            nxt_bb, nxt_sb]
-
-  def counter_increment(self):
-    if self.minute == 0 and self.second == 0:
-      self.current_level += 1
-      self.reset_timer(silent=False)
-      return
-    if self.second == 0:
-      self.minute -= 1
-      self.second = 59
+    super().__init__(config, clock)
+    self.audio = None # displays of a local authority stay silent, the authority rings
+    if not audio:
       return
-    self.second -= 1
-
-  def nxt_level(self):
-    if self.current_level != len(self.config.BIG_BLIND_VALUES)-1:
-      self.current_level += 1
-    self.reset_timer()
-
-  def prev_level(self):
-    if self.current_level != 1:
-      self.current_level -= 1
-    self.reset_timer()
-
-  def reset_level(self):
-    self.current_level = 1
-    self.reset_timer()
+    self.audio = AudioCues()
+    if not load_sounds_async:
+      self.audio.load() # otherwise the audio thread loads them, pygame import and mixer init are slow on small boards
+    self.audio.start()
+    self.audio.attach(self)
 
-  def reset_timer(self, silent=True):
-    if not silent:
-      self.beep.play(maxtime=1500) # crop the sound to a box ring
-    self.minute, self.second = self.config.LEVEL_PERIOD._list()
+# Only the files behind Family/Family2/Family3, add "./fonts/origami-mommy/origa___.ttf" when switching to ORIGAMI_MOMMY
+FONT_FILES = ("./fonts/monofont/monofontorg.otf",
+              "./fonts/space-grotesk/static/SpaceGrotesk-Bold.ttf")
 
-def setupQFontDataBase():
+def setupQFontDataBase(font_files: tuple = FONT_FILES):
   qfont_db = QFontDatabase()
-  qfont_db.addApplicationFont("./fonts/origami-mommy/origa___.ttf")
-  qfont_db.addApplicationFont("./fonts/monofont/monofontorg.otf")
-  qfont_db.addApplicationFont("./fonts/space-grotesk/static/SpaceGrotesk-Bold.ttf")
+  for font_file in font_files:
+    qfont_db.addApplicationFont(font_file)
   return qfont_db
 
 
@@ -160,6 +89,68 @@ class MyFonts:
   PushButton.setFamily(Family3)
 
 
+FONT_BUCKET_PX = 16 # widths within a bucket share one font size table
+
+def width_bucket(width: int) -> int:
+  return max(FONT_BUCKET_PX, width - width % FONT_BUCKET_PX)
+
+
+@lru_cache(maxsize=None)
+def main_window_font_sizes(width: int) -> tuple[int, dict]:
+  ButtonFontSize = int(width / 30)
+  DisplayFontSizes = {"round_timer": int(width / 7),
+                      "blinds": int(width / 15),
+                      "next_blinds": int(width / 25),
+                      "level": int(width / 30),
+                      "total_timer": int(width / 30),
+                      "break_timer": int(width / 18),
+                      "field": int(width / 55)}
+  return ButtonFontSize, DisplayFontSizes
+
+
+SIZED_FONTS: OrderedDict[tuple, QFont] = OrderedDict() # least recently used first
+SIZED_FONTS_MAX = 64 # the handful of sizes on screen and the last ones of a resize drag
+
+def sized_font(font: QFont, point_size: int) -> QFont:
+  # one QFont (and its metrics) per family/style and size, reused across resizes.
+  # Not keyed on font.key(), that holds the size the font had before
+  key = (font.family(), font.weight(), font.style(), font.stretch(), point_size)
+  sized = SIZED_FONTS.get(key)
+  if sized is None:
+    sized = SIZED_FONTS[key] = QFont(font)
+    sized.setPointSize(point_size)
+    if len(SIZED_FONTS) > SIZED_FONTS_MAX:
+      SIZED_FONTS.popitem(last=False)
+  else:
+    SIZED_FONTS.move_to_end(key)
+  return sized
+
+
+class ResizeCoalescer:
+  # Collapses a burst of resize events into at most one apply() per frame
+  def __init__(self, parent, apply, interval_ms: int = 16):
+    self.apply = apply # returns the number of widgets it relayouted
+    self.timer = QTimer(parent)
+    self.timer.setSingleShot(True)
+    self.timer.setInterval(interval_ms)
+    self.timer.timeout.connect(self.flush)
+    self.events = 0
+    self.passes = 0
+    self.relayouts = 0
+
+  def request(self):
+    self.events += 1
+    if not self.timer.isActive():
+      self.timer.start()
+
+  def flush(self):
+    self.passes += 1
+    self.relayouts += self.apply() or 0
+
+  def stats(self) -> dict:
+    return {"events": self.events, "passes": self.passes, "relayouts": self.relayouts}
+
+
 def get_std_size_policy(obj) -> QSizePolicy:
   sizePolicy = QSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
   sizePolicy.setHorizontalStretch(0)
@@ -173,24 +164,6 @@ def get_fixed_size_policy(): #DUNNO IF THIS WORKS
   return sizePolicy
 
 
-def load_config_from_json(path: Path) -> PokerConfig | bool:
-  def dict_to_config(_dict: dict):
-    _dict["LEVEL_PERIOD"] = MyTime(*_dict["LEVEL_PERIOD"])
-    return PokerConfig(**_dict)
-  if not path.exists() or path.is_dir():
-    return False
-  with open(path, "r") as f:
-    config = json.load(f)
-    config["NEW"] = True
-  return dict_to_config(config)
-
-
-def dump_config_to_json(config: PokerConfig):
-  cdict = config.__dict__
-  cdict["LEVEL_PERIOD"] = cdict["LEVEL_PERIOD"]._list()
-  return cdict
-
-
 class MyLabel(QLabel):
   def __init__(self,
                name: str,
@@ -219,6 +192,12 @@ class MyLabel(QLabel):
                        f"border: {border_width}px solid {border_color};"
                        f"border-radius: 0;"
                        f"padding: {padding}px")
+    self.repaint_ms = METRICS.histogram("repaint_ms", name)
+
+  def paintEvent(self, event) -> None:
+    t0 = time.perf_counter()
+    super().paintEvent(event)
+    self.repaint_ms.observe((time.perf_counter() - t0) * 1000)
 
 
 class MyPushButton(QPushButton):
@@ -254,6 +233,43 @@ class MyPushButton(QPushButton):
       return super().mousePressEvent(e)
 
 
+class BackgroundWidget(QWidget):
+  # Paints an image stretched over the widget, the JPEG is decoded once and scaled once per size,
+  # repaints of single labels only copy their rectangle out of the cached pixmap
+  def __init__(self, parent: QWidget | None = None):
+    super().__init__(parent)
+    self.source = QPixmap()
+    self.scaled = QPixmap()
+    self.paints = 0
+    self.rescales = 0
+    self.paint_time_s = 0.0
+
+  def set_image(self, path: Path):
+    self.source = QPixmap(str(path))
+    self.scaled = QPixmap()
+    self.update()
+
+  def paintEvent(self, event) -> None:
+    t0 = time.perf_counter()
+    if self.source.isNull():
+      return
+    if self.scaled.size() != self.size():
+      self.scaled = self.source.scaled(self.size(), QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+      self.rescales += 1
+    painter = QPainter(self)
+    painter.drawPixmap(event.rect(), self.scaled, event.rect())
+    painter.end()
+    elapsed = time.perf_counter() - t0
+    self.paints += 1
+    self.paint_time_s += elapsed
+    METRICS.observe("repaint_ms", "background", elapsed * 1000)
+
+  def paint_stats(self) -> dict:
+    return {"paints": self.paints,
+            "rescales": self.rescales,
+            "mean_ms": round(1000 * self.paint_time_s / self.paints, 3) if self.paints else 0.0}
+
+
 class MainWindowControls(QWidget):
   def __init__(self, parent: QWidget):
     super().__init__(parent=parent)
@@ -270,32 +286,72 @@ class MainWindowControls(QWidget):
     self.setAutoFillBackground(True)
     self.setLayout(layout)
     self.setStyleSheet("background-color: transparent;") # to make the background not white
-
-  def updateFonts(self, font_size: int):
+    self.buttons["StartStop"].setStyleSheet(self.buttons["StartStop"].styleSheet() +
+                                            "QPushButton[running=\"false\"] {"
+                                            "  background-color: rgba(220,220,220,95%);"
+                                            "  border: 2px solid black;"
+                                            "  color: black;"
+                                            "}"
+                                            "QPushButton[running=\"true\"] {"
+                                            "  background-color: rgba(40,40,40,95%);"
+                                            "  border: 2px solid black;"
+                                            "  color: white;"
+                                            "}")
+
+  def updateFonts(self, font_size: int) -> int:
+    changed = 0
     for name, button in self.buttons.items():
-      font = button.font()
-      font.setPointSize(font_size)
+      size = font_size
       if name == "StartStop":
-        font.setPointSize(int(font_size * 1.3)) # increase since it's smaller for some reason than < >
-      button.setFont(font)
+        size = int(font_size * 1.3) # increase since it's smaller for some reason than < >
+      if button.font().pointSize() != size:
+        button.setFont(sized_font(button.font(), size))
+        changed += 1
+    return changed
 
   def connect_clicks(self, function_list: dict):
     for name, val in function_list.items():
-      self.buttons[name].clicked.connect(val)
+      self.buttons[name].clicked.connect(PROFILER.wrap(name, val))
 
   def start_stop_set(self, state: str):
-    if state == "stop":
-      self.buttons["StartStop"].setStyleSheet("background-color: rgba(220,220,220,95%);"
-                                               "border: 2px solid black;"
-                                               "color: black;")
-    elif (state =="start"):
-      self.buttons["StartStop"].setStyleSheet("background-color: rgba(40,40,40,95%);"
-                                              "border: 2px solid black;"
-                                              "color: white;")
+    # switches between the [running=...] rules set up in __init__, polish() reuses the parsed stylesheet
+    button = self.buttons["StartStop"]
+    if state not in ("stop", "start") or button.property("running") == (state == "start"):
+      return
+    button.setProperty("running", state == "start")
+    button.style().unpolish(button)
+    button.style().polish(button)
 
 
 
-class MainWindowDisplay(QWidget):
+class DisplayTexts:
+  # What the main display shows, renderers provide set_label_text(name, text)
+  field = None # FieldTracker of the tournament, set when the field is tracked
+  def update_texts(self, sec_cnt:int):
+    # sec_cnt: ms elapsed within the currently displayed second
+    def vanishing_comma(sec_cnt: int,
+                        on_time: int = 100,
+                        position: int = 300):
+      if (sec_cnt > position) and (sec_cnt < (position + on_time)):
+        return " "
+      return ":"
+    l, m, s, bb, sb, nbb, nsb = self.current_state.get_state()
+    entry = self.current_state.current_entry()
+    print_comma = vanishing_comma(sec_cnt)
+    self.set_label_text("round_timer", f"{m}{print_comma}{s:02d}")
+    if entry.is_break:
+      self.set_label_text("blinds", "BREAK")
+    elif entry.ante:
+      self.set_label_text("blinds", f"{sb}/{bb}/{entry.ante}")
+    else:
+      self.set_label_text("blinds", f"{sb}/{bb}")
+    self.set_label_text("next_blinds", f"NEXT:{nsb}/{nbb}")
+    self.set_label_text("level", f"LEVEL {l:02d}")
+    if self.field is not None:
+      self.set_label_text("field", self.field.text())
+
+
+class MainWindowDisplay(DisplayTexts, QWidget):
   def __init__(self, parent: QWidget, current_state: PokerGameState) -> None:
     super().__init__(parent)
     self.current_state = current_state
@@ -326,6 +382,10 @@ class MainWindowDisplay(QWidget):
                                           border_color="transparent",
                                           bg_color="transparent",
                                           layout_dir=QtCore.Qt.AlignmentFlag.AlignBottom | QtCore.Qt.AlignmentFlag.AlignHCenter)
+    self.labels["field"] = MyLabel("Field",
+                                    border_color="transparent",
+                                    bg_color="transparent",
+                                    layout_dir=QtCore.Qt.AlignmentFlag.AlignBottom | QtCore.Qt.AlignmentFlag.AlignHCenter)
     layout = QGridLayout(self)
     self.setLayout(layout)
     layout.addWidget(self.labels["round_timer"] , 0, 2, 4, 3)
@@ -334,25 +394,26 @@ class MainWindowDisplay(QWidget):
     layout.addWidget(self.labels["blinds"]      , 0, 0, 4, 2)
     layout.addWidget(self.labels["level"]       , 0, 0, 1, 2)
     layout.addWidget(self.labels["next_blinds"] , 3, 0, 1, 2)
+    layout.addWidget(self.labels["field"]       , 2, 0, 1, 2)
+
+    # Last text pushed to each label, setText is skipped when it would not change
+    self.rendered_texts = {name: label.text() for name, label in self.labels.items()}
+    self.repaint_counts = {name: {"performed": 0, "skipped": 0} for name in self.labels}
 
-  def update_fonts(self, font_sizes: dict):
+  def update_fonts(self, font_sizes: dict) -> int:
+    changed = 0
     for name, val in font_sizes.items():
       name = name.lower()
-      if name in self.labels.keys():
-        font = self.labels[name].font()
-        font.setPointSize(val)
-        self.labels[name].setFont(font)
-
-  def update_texts(self, sec_cnt:int):
-    def vanishing_comma(sec_cnt: int,
-                        on_time: int = 100,
-                        position: int = 300):
-      if (sec_cnt > position) and (sec_cnt < (position + on_time)):
-        return " "
-      return ":"
-    l, m, s, bb, sb, nbb, nsb = self.current_state.get_state()
-    print_comma = vanishing_comma(sec_cnt)
-    self.labels["round_timer"].setText(f"{m}{print_comma}{s:02d}")
-    self.labels["blinds"].setText(f"{sb}/{bb}")
-    self.labels["next_blinds"].setText(f"NEXT:{nsb}/{nbb}")
-    self.labels["level"].setText(f"LEVEL {l:02d}")
+      if name in self.labels.keys() and self.labels[name].font().pointSize() != val:
+        self.labels[name].setFont(sized_font(self.labels[name].font(), val))
+        changed += 1
+    return changed
+
+  def set_label_text(self, name: str, text: str) -> bool:
+    if self.rendered_texts[name] == text:
+      self.repaint_counts[name]["skipped"] += 1
+      return False
+    self.labels[name].setText(text)
+    self.rendered_texts[name] = text
+    self.repaint_counts[name]["performed"] += 1
+    return True
@@ -0,0 +1,162 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from config import dump_config_to_json, format_config_json, load_config_from_json
+from schedule import ScheduleError
+
+# Sanity bounds of the periods, outside them a file is reported with a warning
+MIN_LEVEL_S = 60
+MAX_LEVEL_S = 3 * 3600
+MAX_BREAK_S = 3600
+CHUNK_FILES = 64 # files per task sent to a worker, parsing one takes well under a millisecond
+
+
+def check_file(path: Path) -> dict:
+  # errors keep the file out of a venue, warnings are structures that load but look like typos
+  result = {"path": str(path), "name": None, "errors": [], "warnings": [], "canonical": None}
+  try:
+    config = load_config_from_json(path)
+  except ScheduleError as e: # schema, divisibility and every other problem of the file at once
+    result["errors"] = e.errors
+    return result
+  except (OSError, ValueError) as e: # json.JSONDecodeError is a ValueError
+    result["errors"] = [repr(e)]
+    return result
+  if not config: # a directory that matched the pattern
+    result["errors"] = ["Not a config file"]
+    return result
+  result["name"] = config.NAME
+  errors, warnings = result["errors"], result["warnings"]
+  if config.STARTING_CHIP_AMOUNT <= 0 or config.STARTING_CHIP_AMOUNT % config.CHIP_INCREMENT:
+    errors.append(f"STARTING_CHIP_AMOUNT {config.STARTING_CHIP_AMOUNT} is not a positive multiple "
+                  f"of chip increment {config.CHIP_INCREMENT}")
+  levels = [entry for entry in config.compiled().entries if not entry.is_break]
+  for before, entry in zip(levels, levels[1:]):
+    if entry.big_blind < before.big_blind:
+      errors.append(f"Level {entry.level}: big blind {entry.big_blind} is lower than {before.big_blind} before it")
+    elif entry.big_blind == before.big_blind and entry.ante <= before.ante:
+      warnings.append(f"Level {entry.level}: same blinds as level {before.level}")
+    if entry.ante < before.ante:
+      warnings.append(f"Level {entry.level}: ante {entry.ante} is lower than {before.ante} before it")
+  for entry in config.compiled().entries:
+    if entry.is_break and entry.duration_s > MAX_BREAK_S:
+      warnings.append(f"Break after level {entry.level} is {entry.duration_s // 60} minutes long")
+  odd = [f"{entry.level}: {entry.duration_s} s" for entry in levels if not MIN_LEVEL_S <= entry.duration_s <= MAX_LEVEL_S]
+  if odd: # one line, a typo in LEVEL_PERIOD hits every level
+    warnings.append(f"Levels outside {MIN_LEVEL_S}-{MAX_LEVEL_S} s: " + ", ".join(odd))
+  if levels and levels[0].big_blind > config.STARTING_CHIP_AMOUNT:
+    errors.append(f"Level 1: big blind {levels[0].big_blind} is more than the starting stack {config.STARTING_CHIP_AMOUNT}")
+  if not errors:
+    cdict = dump_config_to_json(config)
+    with open(path) as f:
+      content = json.load(f)
+    # keys, their order and values count, whitespace does not: hand-laid-out files are left alone
+    if list(content.items()) != list(cdict.items()):
+      result["canonical"] = format_config_json(cdict)
+  return result
+
+
+def check_files(paths: list[Path], workers: int | None = None) -> list[dict]:
+  workers = workers or os.cpu_count() or 1
+  if workers == 1 or len(paths) <= CHUNK_FILES:
+    return [check_file(path) for path in paths]
+  chunksize = max(1, min(CHUNK_FILES, len(paths) // (workers * 4)))
+  # spawn: forking a process that runs Qt and the audio thread is not safe
+  with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+    return list(pool.map(check_file, paths, chunksize=chunksize))
+
+
+def duplicate_names(results: list[dict]) -> dict[str, list[str]]:
+  # the library and --name look configs up by NAME, case insensitive
+  paths = {}
+  for result in results:
+    if result["name"] is not None:
+      paths.setdefault(result["name"].upper(), []).append(result["path"])
+  return {name: found for name, found in sorted(paths.items()) if len(found) > 1}
+
+
+def collect(paths: list[Path], pattern: str = "*.json") -> dict[Path, Path]:
+  # {file: the directory its place under --output-dir is relative to}, directories are searched recursively
+  files = {}
+  for root in map(Path, paths):
+    if root.is_dir():
+      files.update((path, root) for path in sorted(root.rglob(pattern)))
+    else:
+      files[root] = root.parent
+  return files
+
+
+def validate(paths: list[Path], pattern: str = "*.json", workers: int | None = None) -> dict:
+  t0 = time.perf_counter()
+  files = collect(paths, pattern)
+  results = check_files(list(files), workers)
+  for result, (path, root) in zip(results, files.items()):
+    result["relative"] = str(path.relative_to(root))
+  duplicates = duplicate_names(results)
+  by_path = {result["path"]: result for result in results}
+  for name, found in duplicates.items():
+    for path in found:
+      by_path[path]["errors"].append(f"NAME {name} is also used by " + ", ".join(p for p in found if p != path))
+      by_path[path]["canonical"] = None # not written until the name is fixed
+  return {"paths": [str(path) for path in paths],
+          "files": len(results),
+          "invalid": sum(bool(result["errors"]) for result in results),
+          "warned": sum(bool(result["warnings"]) for result in results),
+          "not_canonical": sum(result["canonical"] is not None for result in results),
+          "duplicates": duplicates,
+          "seconds": round(time.perf_counter() - t0, 3),
+          "results": results}
+
+
+def write_canonical(report: dict, output_dir: Path | None = None) -> int:
+  # valid files rewritten in the layout of configs/, in place or mirrored under output_dir
+  written = 0
+  for result in report["results"]:
+    if result["canonical"] is None:
+      continue
+    path = Path(result["path"])
+    if output_dir is not None:
+      path = output_dir / result["relative"]
+      path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w") as f:
+      f.write(result["canonical"])
+    tmp.replace(path) # the timer's library never reads half a file
+    written += 1
+  return written
+
+
+if __name__ == "__main__":
+  import argparse as argp
+  import sys
+  parser = argp.ArgumentParser(description="Validate every structure under a directory and normalize the valid ones")
+  parser.add_argument("paths", nargs="*", default=[Path("configs")], type=Path, help="Config files and directories")
+  parser.add_argument("-p", "--pattern", default="*.json")
+  parser.add_argument("-w", "--workers", default=None, type=int, help="Processes, all cores by default")
+  parser.add_argument("-o", "--output", default=None, type=Path, help="Write the report as json to this file")
+  parser.add_argument("--write", action="store_true", help="Rewrite valid files whose keys or values are not canonical")
+  parser.add_argument("--output-dir", default=None, type=Path, help="With --write, mirror the tree here instead of in place")
+  parser.add_argument("-q", "--quiet", action="store_true", help="Only print the summary")
+  args = parser.parse_args()
+
+  report = validate(args.paths, args.pattern, args.workers)
+  if not args.quiet:
+    for result in report["results"]:
+      for error in result["errors"]:
+        print(f"{result['path']}: error: {error}")
+      for warning in result["warnings"]:
+        print(f"{result['path']}: warning: {warning}")
+  if args.write:
+    print(f"Wrote {write_canonical(report, args.output_dir)} canonical files")
+  if args.output is not None:
+    with open(args.output, "w") as f:
+      json.dump({**report, "results": [{key: val for key, val in result.items() if key != "canonical"} |
+                                       {"canonical": result["canonical"] is None and not result["errors"]}
+                                       for result in report["results"]]}, f, indent=2)
+  print(f"{report['files']} files in {report['seconds']} s: {report['invalid']} invalid, {report['warned']} with warnings, "
+        f"{report['not_canonical']} not canonical, {len(report['duplicates'])} duplicate names")
+  sys.exit(1 if report["invalid"] else 0)